@@ -4,6 +4,10 @@ This serves as a simple web interface and keeps the bot alive.
 """
 import os
 import logging
+
+# Tell models.py to bind to this app's Flask-SQLAlchemy instance
+os.environ.setdefault("USE_WEB", "1")
+
 from flask import Flask, jsonify, Response
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
@@ -22,8 +26,12 @@ app.secret_key = os.environ.get("SESSION_SECRET", "default-secret-key")
 
 # Configure database
 app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL")
+# Keep warm connections for the bot's event handlers; pre-ping catches ones the
+# server dropped before they are recycled
 app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
+    "pool_size": 10,
+    "max_overflow": 20,
+    "pool_recycle": 1800,
     "pool_pre_ping": True,
 }
 db.init_app(app)
@@ -32,8 +40,10 @@ with app.app_context():
     # Import the models here to avoid circular imports
     import models  # noqa: F401
     
-    # Create tables if they don't exist
+    # Create tables if they don't exist, then bring older databases' columns up to date
     db.create_all()
+    models.migrate_legacy_tags(db.engine)
+    models.migrate_timestamp_defaults(db.engine)
     logger.info("Database tables created or verified")
 
 @app.route('/')
@@ -2,11 +2,14 @@
 Bot module defining the core Discord bot class with event handlers and setup.
 """
 import logging
+import asyncio
 import discord
 from discord.ext import commands
 import os
 import platform
-from config import BOT_PREFIX, BOT_DESCRIPTION, BOT_STATUS
+from config import BOT_PREFIX, BOT_DESCRIPTION, BOT_STATUS, LOOP_MONITOR_THRESHOLD_MS
+from utils.ai_service import get_ai_service
+from launcher import event_loop_factory
 
 logger = logging.getLogger(__name__)
 
@@ -26,9 +29,19 @@ class GeminiBot(commands.Bot):
             intents=intents,
             # Help command will be set by the Polish help cog
         )
+        
+        # One AI service shared by every cog
+        self.ai_service = get_ai_service()
     
     async def setup_hook(self):
         """Setup hook called when the bot is being prepared to connect to Discord."""
+        if LOOP_MONITOR_THRESHOLD_MS > 0:
+            # asyncio's debug mode logs every callback slower than slow_callback_duration
+            loop = asyncio.get_running_loop()
+            loop.set_debug(True)
+            loop.slow_callback_duration = LOOP_MONITOR_THRESHOLD_MS / 1000
+            logger.info(f"Reporting event loop blocks over {LOOP_MONITOR_THRESHOLD_MS}ms")
+        
         # Load all cogs
         logger.info("Loading cogs...")
         
@@ -83,8 +96,10 @@ class GeminiBot(commands.Bot):
                     logger.error("AI Commands cog not found")
                     await message.channel.send("❌ Error: AI service is not available.")
         
-        # Process commands as usual (for prefix commands)
-        await self.process_commands(message)
+        # Process commands as usual (for prefix commands); ordinary chatter can't
+        # be a command, so skip the parser for it
+        if message.content.startswith(BOT_PREFIX):
+            await self.process_commands(message)
     
     async def on_command_error(self, ctx, error):
         """Global error handler for command errors."""
@@ -97,3 +112,38 @@ class GeminiBot(commands.Bot):
         else:
             logger.error(f"Command error: {error}")
             await ctx.send(f"❌ An error occurred: {error}")
+
+
+# Upper bound for the exponential backoff used when Discord sends no Retry-After
+MAX_LOGIN_BACKOFF = 300
+# Rate-limited logins attempted before giving up
+MAX_LOGIN_ATTEMPTS = 8
+
+async def _start_with_retry(token):
+    """
+    Log in and run the bot, waiting out Discord rate limits.
+    
+    Gives up after MAX_LOGIN_ATTEMPTS rate-limited logins by re-raising the last error.
+    """
+    for attempt in range(1, MAX_LOGIN_ATTEMPTS + 1):
+        bot = GeminiBot()
+        try:
+            async with bot:
+                await bot.start(token, reconnect=True)
+            return
+        except discord.errors.HTTPException as e:
+            if e.status != 429 or attempt == MAX_LOGIN_ATTEMPTS:
+                raise
+            retry_after = e.response.headers.get("Retry-After") if e.response is not None else None
+            delay = float(retry_after) if retry_after else min(2 ** (attempt - 1), MAX_LOGIN_BACKOFF)
+            logger.warning(f"Discord rate limit exceeded, retrying in {delay:.1f}s "
+                           f"(attempt {attempt}/{MAX_LOGIN_ATTEMPTS}): {e}")
+            await asyncio.sleep(delay)
+
+def run_bot(token):
+    """Run the bot until it disconnects, retrying the login on Discord rate limits."""
+    try:
+        with asyncio.Runner(loop_factory=event_loop_factory()) as runner:
+            runner.run(_start_with_retry(token))
+    except KeyboardInterrupt:
+        logger.info("Bot stopped by user")
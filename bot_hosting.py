@@ -11,7 +11,7 @@ from pathlib import Path
 import discord
 from discord.ext import commands
 import google.generativeai as genai
-from dotenv import load_dotenv
+from config import load_env_once
 
 # Ensure logs directory exists
 Path("logs").mkdir(exist_ok=True)
@@ -59,12 +59,11 @@ class AICommands(commands.Cog):
         if len(response) <= 2000:
             await ctx.reply(response)
         else:
-            chunks = [response[i:i+2000] for i in range(0, len(response), 2000)]
-            for i, chunk in enumerate(chunks):
-                if i == 0:
-                    await ctx.reply(f"{chunk}\n(1/{len(chunks)})")
-                else:
-                    await ctx.send(f"{chunk}\n({i+1}/{len(chunks)})")
+            total = -(-len(response) // 2000)
+            for i, start in enumerate(range(0, len(response), 2000)):
+                chunk = response[start:start+2000]
+                send = ctx.reply if i == 0 else ctx.send
+                await send(f"{chunk}\n({i+1}/{total})")
 
 class GeminiBot(commands.Bot):
     def __init__(self):
@@ -93,7 +92,7 @@ class GeminiBot(commands.Bot):
         )
 
 def main():
-    load_dotenv()
+    load_env_once()
     
     token = os.getenv("DISCORD_TOKEN")
     if not token:
@@ -34,8 +34,8 @@ logger.info("Starting clean Discord bot with no Flask components")
 
 # Load environment variables from .env if possible
 try:
-    from dotenv import load_dotenv
-    load_dotenv()
+    from config import load_env_once
+    load_env_once()
     logger.info("Loaded environment variables from .env file")
     
     # Set database URL if needed
@@ -561,7 +561,7 @@ class ConversationManager:
         
         return conversation
     
-    def add_user_message(self, user_id: int, content: str, author_name: str = "") -> None:
+    def add_user_message(self, user_id: int, content: str, author_name: str = "", persist: bool = True) -> None:
         """
         Add a user message to their conversation history.
         
@@ -569,6 +569,7 @@ class ConversationManager:
             user_id: Discord user ID
             content: Message content
             author_name: Name of the user
+            persist: Also save to the database; pass False when add_exchange() will save it with the reply
         """
         # Get the conversation
         conversation = self.get_user_conversation(user_id, author_name)
@@ -585,7 +586,7 @@ class ConversationManager:
         conversation.add_message(message)
         
         # Also add to database if available
-        if self.db_adapter:
+        if self.db_adapter and persist:
             try:
                 self.db_adapter.add_user_message(user_id, content, author_name)
             except Exception as e:
@@ -620,7 +621,8 @@ class ConversationManager:
             except Exception as e:
                 logger.error(f"Error saving assistant message to database: {e}")
     
-    def add_channel_user_message(self, channel_id: int, user_id: int, content: str, author_name: str = "") -> None:
+    def add_channel_user_message(self, channel_id: int, user_id: int, content: str, author_name: str = "",
+                                 persist: bool = True) -> None:
         """
         Add a user message to a channel's conversation history.
         
@@ -629,6 +631,7 @@ class ConversationManager:
             user_id: Discord user ID
             content: Message content
             author_name: Name of the user
+            persist: Also save to the database; pass False when add_channel_exchange() will save it with the reply
         """
         # Get the conversation
         conversation = self.get_channel_conversation(channel_id)
@@ -645,7 +648,7 @@ class ConversationManager:
         conversation.add_message(message)
         
         # Also add to database if available
-        if self.db_adapter:
+        if self.db_adapter and persist:
             try:
                 self.db_adapter.add_channel_user_message(channel_id, user_id, content, author_name)
             except Exception as e:
@@ -680,6 +683,60 @@ class ConversationManager:
             except Exception as e:
                 logger.error(f"Error saving channel assistant message to database: {e}")
     
+    def add_exchange(self, user_id: int, user_content: str, assistant_content: str, author_name: str = "") -> None:
+        """
+        Add the assistant's reply to a user message added with persist=False, saving
+        both messages to the database in one transaction.
+        
+        Args:
+            user_id: Discord user ID
+            user_content: The user message being answered (already in memory)
+            assistant_content: The assistant's reply
+            author_name: Name of the user
+        """
+        # Add the reply to the in-memory conversation
+        self.get_user_conversation(user_id).add_message(Message(
+            role="assistant",
+            content=assistant_content,
+            author_name="Gemini",
+            author_id=0  # 0 for the bot itself
+        ))
+        
+        # Save both messages to the database if available
+        if self.db_adapter:
+            try:
+                self.db_adapter.add_exchange(user_id, user_content, assistant_content, author_name)
+            except Exception as e:
+                logger.error(f"Error saving exchange to database: {e}")
+    
+    def add_channel_exchange(self, channel_id: int, user_id: int, user_content: str,
+                             assistant_content: str, author_name: str = "") -> None:
+        """
+        Add the assistant's reply to a channel user message added with persist=False,
+        saving both messages to the database in one transaction.
+        
+        Args:
+            channel_id: Discord channel ID
+            user_id: Discord user ID
+            user_content: The user message being answered (already in memory)
+            assistant_content: The assistant's reply
+            author_name: Name of the user
+        """
+        # Add the reply to the in-memory conversation
+        self.get_channel_conversation(channel_id).add_message(Message(
+            role="assistant",
+            content=assistant_content,
+            author_name="Gemini",
+            author_id=0  # 0 for the bot itself
+        ))
+        
+        # Save both messages to the database if available
+        if self.db_adapter:
+            try:
+                self.db_adapter.add_channel_exchange(channel_id, user_id, user_content, assistant_content, author_name)
+            except Exception as e:
+                logger.error(f"Error saving channel exchange to database: {e}")
+    
     def clear_user_conversation(self, user_id: int) -> bool:
         """
         Clear a user's conversation history.
@@ -877,6 +934,12 @@ class ConversationManager:
 # Create a singleton conversation manager instance
 conversation_manager = ConversationManager()
 
+def _extract_text(response) -> str:
+    """Get the text of a Gemini response (or streamed chunk), falling back to its first part."""
+    text = getattr(response, "text", None)
+    return text if text is not None else response.candidates[0].content.parts[0].text
+
+
 class GeminiAIService:
     """Service for interacting with the Gemini AI API."""
     
@@ -933,7 +996,7 @@ class GeminiAIService:
                 if user_id:
                     # User-specific conversation
                     conversation = conversation_manager.get_user_conversation(user_id)
-                    conversation_manager.add_user_message(user_id, prompt, author_name)
+                    conversation_manager.add_user_message(user_id, prompt, author_name, persist=False)
                     conversation_history = conversation.get_formatted_history()
                     conversation_preview = conversation_manager.get_user_conversation_preview(user_id)
                     
@@ -954,7 +1017,7 @@ class GeminiAIService:
                 elif channel_id:
                     # Channel-specific conversation
                     conversation = conversation_manager.get_channel_conversation(channel_id)
-                    conversation_manager.add_channel_user_message(channel_id, user_id or 0, prompt, author_name)
+                    conversation_manager.add_channel_user_message(channel_id, user_id or 0, prompt, author_name, persist=False)
                     conversation_history = conversation.get_formatted_history()
                     conversation_preview = conversation_manager.get_channel_conversation_preview(channel_id)
                     
@@ -980,48 +1043,27 @@ class GeminiAIService:
                 for param, value in personality_params.items():
                     generation_config[param] = value
             
+            # The instructions go in as the system instruction so every request starts with
+            # the same tokens; the contents are only the conversation turns
             model = genai.GenerativeModel(
                 model_name=self.model_name,
-                generation_config=generation_config
+                generation_config=generation_config,
+                system_instruction=self.system_instructions
             )
             
-            # Prepare the content for the model based on whether we have conversation history
-            if conversation_history:
-                # Note: Gemini 1.5 doesn't support system role, use user message with instructions
-                instructions_message = {"role": "user", "parts": [{"text": f"Instructions for you: {self.system_instructions}"}]}
-                
-                # Make sure none of the messages use "system" role
-                sanitized_history = []
-                for msg in conversation_history:
-                    # If role is "system", change it to "user"
-                    msg_copy = msg.copy()
-                    if msg_copy["role"] == "system":
-                        msg_copy["role"] = "user"
-                    sanitized_history.append(msg_copy)
-                
-                conversation_with_instructions = [instructions_message] + sanitized_history
-                
-                # Use conversation history to generate a contextual response
-                response = await asyncio.to_thread(
-                    model.generate_content,
-                    conversation_with_instructions
-                )
-            else:
-                # No conversation history, use structured messages
-                messages = [
-                    {"role": "user", "parts": [{"text": f"Instructions for you: {self.system_instructions}"}]},
-                    {"role": "user", "parts": [{"text": prompt}]}
-                ]
-                response = await asyncio.to_thread(
-                    model.generate_content,
-                    messages
-                )
+            # Make sure none of the messages use "system" role
+            turns = []
+            for msg in conversation_history or [{"role": "user", "parts": [{"text": prompt}]}]:
+                # If role is "system", change it to "user"
+                msg_copy = msg.copy()
+                if msg_copy["role"] == "system":
+                    msg_copy["role"] = "user"
+                turns.append(msg_copy)
+            
+            response = await asyncio.to_thread(model.generate_content, turns)
             
             # Extract the text from the response
-            if hasattr(response, 'text'):
-                response_text = response.text
-            else:
-                response_text = str(response.candidates[0].content.parts[0].text)
+            response_text = _extract_text(response)
             
             # Build styled response with mood, energy, and personality indicators
             styled_response = response_text
@@ -1053,12 +1095,13 @@ class GeminiAIService:
             
             styled_response = f"{prefix}{response_text}{suffix}"
             
-            # Store the assistant's response in conversation memory if enabled
+            # Store the assistant's response in conversation memory if enabled; the prompt
+            # is saved to the database together with it in one transaction
             if ENABLE_CONVERSATION_MEMORY:
                 if user_id:
-                    conversation_manager.add_assistant_message(user_id, response_text)
+                    conversation_manager.add_exchange(user_id, prompt, response_text, author_name)
                 elif channel_id:
-                    conversation_manager.add_channel_assistant_message(channel_id, response_text)
+                    conversation_manager.add_channel_exchange(channel_id, user_id or 0, prompt, response_text, author_name)
             
             # Return the styled response and the conversation object
             if ENABLE_CONVERSATION_MEMORY:
@@ -9,7 +9,6 @@ from discord.ext import commands
 from typing import Optional, List
 
 from config import BOT_OWNERS, ADMIN_ROLE_NAME
-from utils.ai_service import GeminiAIService
 import utils.db_conversation_adapter
 
 logger = logging.getLogger(__name__)
@@ -20,7 +19,7 @@ class AdminCommands(commands.Cog, name="Admin Commands"):
     def __init__(self, bot):
         """Initialize the admin commands cog."""
         self.bot = bot
-        self.ai_service = GeminiAIService()
+        self.ai_service = bot.ai_service
         self.db_adapter = utils.db_conversation_adapter.DBConversationAdapter()
     
     async def cog_check(self, ctx):
@@ -18,13 +18,15 @@ from config import (
     MAX_RESPONSE_LENGTH,
     ENABLE_CONVERSATION_MEMORY
 )
-from utils.ai_service import GeminiAIService
 
 logger = logging.getLogger(__name__)
 
 # Channel cooldown tracking
 channel_cooldowns: Dict[int, float] = {}
 
+# Minimum seconds between edits of a streaming reply (Discord rate-limits message edits)
+STREAM_EDIT_INTERVAL = 1.0
+
 
 class AICommands(commands.Cog, name="AI Commands"):
     """Commands for interacting with Gemini 1.5 AI."""
@@ -32,7 +34,10 @@ class AICommands(commands.Cog, name="AI Commands"):
     def __init__(self, bot):
         """Initialize the AI commands cog."""
         self.bot = bot
-        self.ai_service = GeminiAIService()
+        self.ai_service = bot.ai_service
+
+        # The about embed never changes at runtime, so build it once
+        self._about_embed = self._build_about_embed()
 
         # Command cooldowns
         self.cooldowns = commands.CooldownMapping.from_cooldown(
@@ -66,33 +71,36 @@ class AICommands(commands.Cog, name="AI Commands"):
                 user_id = ctx.author.id if ENABLE_CONVERSATION_MEMORY else None
                 author_name = ctx.author.display_name
 
-                # Generate the AI response with conversation memory
-                response, conversation_preview = await self.ai_service.generate_response(
-                    prompt, 
+                # Stream the AI response into the "thinking" message as it is generated
+                parts = []
+                last_edit = time.monotonic()
+                async for piece in self.ai_service.stream_response(
+                    prompt,
                     user_id=user_id,
                     author_name=author_name
-                )
+                ):
+                    parts.append(piece)
+                    now = time.monotonic()
+                    if now - last_edit >= STREAM_EDIT_INTERVAL:
+                        last_edit = now
+                        await thinking_msg.edit(content="".join(parts)[-MAX_RESPONSE_LENGTH:])
+                response = "".join(parts)
 
                 # Split the response if it's too long for Discord
                 if len(response) > MAX_RESPONSE_LENGTH:
-                    chunks = [response[i:i+MAX_RESPONSE_LENGTH] 
-                              for i in range(0, len(response), MAX_RESPONSE_LENGTH)]
-
-                    # Delete the "thinking" message
+                    # Delete the partial message
                     await thinking_msg.delete()
 
-                    # Send the first chunk
-                    await ctx.send(chunks[0])
-
-                    # Send additional chunks
-                    for chunk in chunks[1:]:
-                        await ctx.send(chunk)
+                    # Send each chunk as it is sliced instead of building the full list first
+                    for start in range(0, len(response), MAX_RESPONSE_LENGTH):
+                        await ctx.send(response[start:start+MAX_RESPONSE_LENGTH])
                 else:
-                    # Delete the "thinking" message
-                    await thinking_msg.delete()
+                    # Show the complete response
+                    await thinking_msg.edit(content=response)
 
-                    # Send the complete response
-                    await ctx.send(response)
+                conversation_preview = None
+                if user_id:
+                    conversation_preview = await self.ai_service.get_conversation_preview(user_id=user_id)
 
                 # If we have a conversation preview, send it as an embed
                 if conversation_preview:
@@ -118,6 +126,11 @@ class AICommands(commands.Cog, name="AI Commands"):
     @commands.command()
     async def about(self, ctx):
         """Show information about the Gemini AI bot."""
+        await ctx.send(embed=self._about_embed)
+
+    @staticmethod
+    def _build_about_embed() -> discord.Embed:
+        """Build the about embed; its content only depends on config."""
         embed = discord.Embed(
             title="About Gemini 1.5 AI Bot",
             description="This bot is powered by Google's Gemini 1.5 AI model.",
@@ -176,7 +189,7 @@ class AICommands(commands.Cog, name="AI Commands"):
         # Set footer
         embed.set_footer(text="Powered by Gemini 1.5 AI")
 
-        await ctx.send(embed=embed)
+        return embed
 
     @commands.command()
     async def say(self, ctx, channel_id: int, *, message: str):
@@ -501,13 +514,11 @@ class AICommands(commands.Cog, name="AI Commands"):
 
                 # Split the response if it's too long for Discord
                 if len(response) > MAX_RESPONSE_LENGTH:
-                    chunks = [response[i:i+MAX_RESPONSE_LENGTH] 
-                              for i in range(0, len(response), MAX_RESPONSE_LENGTH)]
-
-                    # Send all chunks as replies
-                    for i, chunk in enumerate(chunks):
+                    # Send each chunk as it is sliced instead of building the full list first
+                    for start in range(0, len(response), MAX_RESPONSE_LENGTH):
+                        chunk = response[start:start+MAX_RESPONSE_LENGTH]
                         # First chunk is a reply, rest are regular messages to avoid notification spam
-                        if i == 0:
+                        if start == 0:
                             await message.reply(chunk)
                         else:
                             await message.channel.send(chunk)
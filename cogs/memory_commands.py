@@ -9,7 +9,6 @@ from discord.ext import commands
 from typing import Optional, List, Dict, Any
 
 from config import ENABLE_CONVERSATION_MEMORY
-from utils.ai_service import GeminiAIService
 from utils.db_conversation_adapter import DBConversationAdapter
 
 logger = logging.getLogger(__name__)
@@ -20,7 +19,7 @@ class MemoryCommands(commands.Cog, name="Memory Commands"):
     def __init__(self, bot):
         """Initialize the memory commands cog."""
         self.bot = bot
-        self.ai_service = GeminiAIService()
+        self.ai_service = bot.ai_service
         self.db_adapter = DBConversationAdapter()
         
         logger.info("Memory commands cog initialized")
@@ -3,10 +3,20 @@ Configuration module for the Discord bot.
 Contains various settings and constants used throughout the application.
 """
 import os
+from functools import lru_cache
+from types import MappingProxyType
 from dotenv import load_dotenv
 
+
+def load_env_once() -> None:
+    """Load the .env file once per process tree; child processes inherit the result."""
+    if not os.environ.get("_ENV_LOADED"):
+        load_dotenv()
+        os.environ["_ENV_LOADED"] = "1"
+
+
 # Load environment variables
-load_dotenv()
+load_env_once()
 
 # Bot configuration
 BOT_PREFIX = os.getenv("BOT_PREFIX", "!") 
@@ -17,11 +27,21 @@ BOT_STATUS = os.getenv("BOT_STATUS", "Powered by Gemini 1.5")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
 GEMINI_MAX_TOKENS = int(os.getenv("GEMINI_MAX_TOKENS", "1024"))
+GEMINI_MAX_INPUT_TOKENS = int(os.getenv("GEMINI_MAX_INPUT_TOKENS", "32768"))  # Whole-request budget; oldest turns are dropped to fit
 GEMINI_TEMPERATURE = float(os.getenv("GEMINI_TEMPERATURE", "0.7"))
 GEMINI_TOP_P = float(os.getenv("GEMINI_TOP_P", "0.9"))
 GEMINI_TOP_K = int(os.getenv("GEMINI_TOP_K", "40"))
 GEMINI_SYSTEM_INSTRUCTIONS = os.getenv("GEMINI_SYSTEM_INSTRUCTIONS", 
     "You are a helpful, creative, and friendly AI assistant named Gemini. You are having a conversation through Discord.")
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "8"))  # Maximum concurrent Gemini API calls
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "30"))  # Seconds to wait for a Gemini call (or each streamed chunk)
+GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "false").lower() == "true"  # Explicitly cache long system instructions
+
+# Optional semantic response cache: near-identical prompts (by embedding similarity) reuse an answer.
+# Off by default because every cache miss then costs an extra embedding call.
+SEMANTIC_CACHE_ENABLED = os.getenv("GEMINI_SEMANTIC_CACHE", "false").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("GEMINI_SEMANTIC_CACHE_THRESHOLD", "0.92"))
+EMBEDDING_MODEL = "models/text-embedding-004"
 
 # Auto-response configuration
 # Comma-separated list of channel IDs where the bot should respond to all messages
@@ -36,6 +56,9 @@ RESPONSE_FOOTER = ""
 # Cooldown settings (in seconds)
 COMMAND_COOLDOWN = int(os.getenv("COMMAND_COOLDOWN", "5"))
 
+# Event loop monitoring: log callbacks that block longer than this (milliseconds, 0 disables)
+LOOP_MONITOR_THRESHOLD_MS = float(os.getenv("LOOP_MONITOR_THRESHOLD_MS", "0"))
+
 # Conversation memory settings
 ENABLE_CONVERSATION_MEMORY = os.getenv("ENABLE_CONVERSATION_MEMORY", "true").lower() == "true"
 MAX_CONVERSATION_HISTORY = int(os.getenv("MAX_CONVERSATION_HISTORY", "10"))  # Number of messages to remember
@@ -53,110 +76,146 @@ ENABLE_ENERGY_METER = os.getenv("ENABLE_ENERGY_METER", "true").lower() == "true"
 DEFAULT_PERSONALITY = os.getenv("DEFAULT_PERSONALITY", "balanced")
 USER_SELECTABLE_PERSONALITY = os.getenv("USER_SELECTABLE_PERSONALITY", "true").lower() == "true"
 
-# Personality definitions
-PERSONALITIES = {
-    "balanced": {
-        "name": "Balanced",
-        "description": "A well-rounded assistant that balances helpfulness, creativity, and precision.",
-        "gemini_params": {
-            "temperature": 0.7,
-            "top_p": 0.9,
-            "top_k": 40
-        },
-        "style_guide": "Balanced and adaptable, I provide comprehensive but concise answers.",
-        "emoji": "⚖️"
-    },
-    "creative": {
-        "name": "Creative",
-        "description": "Emphasizes creative and imaginative responses with more varied output.",
-        "gemini_params": {
-            "temperature": 0.9,
-            "top_p": 0.95,
-            "top_k": 50
+# Default mood
+DEFAULT_MOOD = "thoughtful"
+
+# Names of the available personalities and moods. The full tables are only
+# built on first access through get_personality() / get_mood().
+PERSONALITY_NAMES = frozenset(("balanced", "creative", "precise", "friendly", "technical"))
+MOOD_NAMES = ("happy", "thoughtful", "curious", "playful", "professional", "calm", "excited")
+
+
+@lru_cache(maxsize=None)
+def _personality_table():
+    """Build the personality definitions."""
+    return {
+        "balanced": {
+            "name": "Balanced",
+            "description": "A well-rounded assistant that balances helpfulness, creativity, and precision.",
+            "gemini_params": {
+                "temperature": 0.7,
+                "top_p": 0.9,
+                "top_k": 40
+            },
+            "style_guide": "Balanced and adaptable, I provide comprehensive but concise answers.",
+            "emoji": "⚖️"
         },
-        "style_guide": "I'm particularly creative and expressive, offering imaginative and detailed responses.",
-        "emoji": "🎨"
-    },
-    "precise": {
-        "name": "Precise",
-        "description": "Focuses on accuracy and conciseness with less creative variation.",
-        "gemini_params": {
-            "temperature": 0.3,
-            "top_p": 0.75,
-            "top_k": 20
+        "creative": {
+            "name": "Creative",
+            "description": "Emphasizes creative and imaginative responses with more varied output.",
+            "gemini_params": {
+                "temperature": 0.9,
+                "top_p": 0.95,
+                "top_k": 50
+            },
+            "style_guide": "I'm particularly creative and expressive, offering imaginative and detailed responses.",
+            "emoji": "🎨"
         },
-        "style_guide": "I'm precise and to-the-point, focusing on accuracy and brevity.",
-        "emoji": "🎯"
-    },
-    "friendly": {
-        "name": "Friendly",
-        "description": "Warm and conversational, with a focus on approachability.",
-        "gemini_params": {
-            "temperature": 0.8,
-            "top_p": 0.9,
-            "top_k": 45
+        "precise": {
+            "name": "Precise",
+            "description": "Focuses on accuracy and conciseness with less creative variation.",
+            "gemini_params": {
+                "temperature": 0.3,
+                "top_p": 0.75,
+                "top_k": 20
+            },
+            "style_guide": "I'm precise and to-the-point, focusing on accuracy and brevity.",
+            "emoji": "🎯"
         },
-        "style_guide": "I'm warm, friendly, and conversational, like talking to a helpful friend.",
-        "emoji": "🤗"
-    },
-    "technical": {
-        "name": "Technical",
-        "description": "Specializes in detailed technical explanations with appropriate terminology.",
-        "gemini_params": {
-            "temperature": 0.5,
-            "top_p": 0.85,
-            "top_k": 30
+        "friendly": {
+            "name": "Friendly",
+            "description": "Warm and conversational, with a focus on approachability.",
+            "gemini_params": {
+                "temperature": 0.8,
+                "top_p": 0.9,
+                "top_k": 45
+            },
+            "style_guide": "I'm warm, friendly, and conversational, like talking to a helpful friend.",
+            "emoji": "🤗"
         },
-        "style_guide": "I focus on technical accuracy and detail, using appropriate terminology and structure.",
-        "emoji": "🔧"
+        "technical": {
+            "name": "Technical",
+            "description": "Specializes in detailed technical explanations with appropriate terminology.",
+            "gemini_params": {
+                "temperature": 0.5,
+                "top_p": 0.85,
+                "top_k": 30
+            },
+            "style_guide": "I focus on technical accuracy and detail, using appropriate terminology and structure.",
+            "emoji": "🔧"
+        }
     }
-}
 
-# Mood definitions and their emoji indicators
-MOODS = {
-    "happy": {
-        "emoji": "😊",
-        "prefixes": ["Happily, ", "With joy, ", "Excitedly, "],
-        "suffixes": [" Feeling cheerful today!", " That was fun to answer!", " Hope that helps!"],
-        "energy": 5  # High energy
-    },
-    "thoughtful": {
-        "emoji": "🤔",
-        "prefixes": ["Hmm, ", "Let me think... ", "Considering that, "],
-        "suffixes": [" Still pondering this one...", " Quite an interesting question!", " What do you think?"],
-        "energy": 3  # Medium energy
-    },
-    "curious": {
-        "emoji": "🧐",
-        "prefixes": ["Interestingly, ", "Curiously, ", "I wonder... "],
-        "suffixes": [" That's fascinating!", " I'd like to learn more about that.", " What else can we explore here?"],
-        "energy": 4  # Medium-high energy
-    },
-    "playful": {
-        "emoji": "😏",
-        "prefixes": ["Oh! ", "Fun fact: ", "Ready for this? "],
-        "suffixes": [" Bet you didn't expect that answer!", " That's a fun one!", " *winks*"],
-        "energy": 5  # High energy
-    },
-    "professional": {
-        "emoji": "👨‍💼",
-        "prefixes": ["Professionally speaking, ", "According to best practices, ", "In my analysis, "],
-        "suffixes": [" Hope that clarifies things.", " Let me know if you need more specific information.", " Is there anything else you'd like to know?"],
-        "energy": 2  # Lower energy
-    },
-    "calm": {
-        "emoji": "😌",
-        "prefixes": ["Calmly, ", "With measured thought, ", "Serenely, "],
-        "suffixes": [" Take your time to digest that.", " How does that resonate with you?", " I'm here whenever you're ready for more."],
-        "energy": 1  # Very low energy
-    },
-    "excited": {
-        "emoji": "🤩",
-        "prefixes": ["WOW! ", "How exciting! ", "Oh my goodness! "],
-        "suffixes": [" Isn't that AMAZING?!", " This is so cool!", " I'm thrilled to share this with you!"],
-        "energy": 5  # Maximum energy
+
+@lru_cache(maxsize=None)
+def _mood_table():
+    """Build the mood definitions and their emoji indicators."""
+    return {
+        "happy": {
+            "emoji": "😊",
+            "prefixes": ["Happily, ", "With joy, ", "Excitedly, "],
+            "suffixes": [" Feeling cheerful today!", " That was fun to answer!", " Hope that helps!"],
+            "energy": 5  # High energy
+        },
+        "thoughtful": {
+            "emoji": "🤔",
+            "prefixes": ["Hmm, ", "Let me think... ", "Considering that, "],
+            "suffixes": [" Still pondering this one...", " Quite an interesting question!", " What do you think?"],
+            "energy": 3  # Medium energy
+        },
+        "curious": {
+            "emoji": "🧐",
+            "prefixes": ["Interestingly, ", "Curiously, ", "I wonder... "],
+            "suffixes": [" That's fascinating!", " I'd like to learn more about that.", " What else can we explore here?"],
+            "energy": 4  # Medium-high energy
+        },
+        "playful": {
+            "emoji": "😏",
+            "prefixes": ["Oh! ", "Fun fact: ", "Ready for this? "],
+            "suffixes": [" Bet you didn't expect that answer!", " That's a fun one!", " *winks*"],
+            "energy": 5  # High energy
+        },
+        "professional": {
+            "emoji": "👨‍💼",
+            "prefixes": ["Professionally speaking, ", "According to best practices, ", "In my analysis, "],
+            "suffixes": [" Hope that clarifies things.", " Let me know if you need more specific information.", " Is there anything else you'd like to know?"],
+            "energy": 2  # Lower energy
+        },
+        "calm": {
+            "emoji": "😌",
+            "prefixes": ["Calmly, ", "With measured thought, ", "Serenely, "],
+            "suffixes": [" Take your time to digest that.", " How does that resonate with you?", " I'm here whenever you're ready for more."],
+            "energy": 1  # Very low energy
+        },
+        "excited": {
+            "emoji": "🤩",
+            "prefixes": ["WOW! ", "How exciting! ", "Oh my goodness! "],
+            "suffixes": [" Isn't that AMAZING?!", " This is so cool!", " I'm thrilled to share this with you!"],
+            "energy": 5  # Maximum energy
+        }
     }
-}
+
+
+def get_personality(name):
+    """Get a personality definition, falling back to the default personality."""
+    table = _personality_table()
+    return table.get(name) or table[DEFAULT_PERSONALITY]
+
+
+def get_mood(name):
+    """Get a mood definition, falling back to the default mood."""
+    table = _mood_table()
+    return table.get(name) or table[DEFAULT_MOOD]
+
+
+def __getattr__(name):
+    """Keep the old PERSONALITIES / MOODS dicts importable, as read-only views built on first access."""
+    if name == "PERSONALITIES":
+        return MappingProxyType(_personality_table())
+    if name == "MOODS":
+        return MappingProxyType(_mood_table())
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # Energy level emojis (0 lowest, 5 highest)
 ENERGY_LEVEL_INDICATORS = {
@@ -167,6 +226,3 @@ ENERGY_LEVEL_INDICATORS = {
     4: "⚡⚡⚡⚡", # Medium-high energy
     5: "⚡⚡⚡⚡⚡" # Full energy
 }
-
-# Default mood
-DEFAULT_MOOD = "thoughtful"
\ No newline at end of file
@@ -1,51 +1,46 @@
 #!/usr/bin/env python3
 """
-Simple standalone Discord bot entry point.
-This file is explicitly designed to avoid any Flask imports or port bindings.
+Discord bot entry point.
+
+Runs the Discord bot on its own by default. Pass --web to also serve the
+Flask web interface from the same process.
 """
 import os
-import sys
 import logging
-from dotenv import load_dotenv
-from bot import GeminiBot
+import argparse
+import threading
 from utils.logger import setup_logger
+from launcher import start
+from config import load_env_once
 
-# Block Flask from being imported by anything
-sys.modules['flask'] = type('MockFlask', (), {
-    'Flask': type('MockFlaskClass', (), {
-        '__init__': lambda *args, **kwargs: None,
-        '__getattr__': lambda self, name: lambda *args, **kwargs: None
-    })
-})
-
-# Load environment variables
-load_dotenv()
+# Load environment variables (once per process tree; children inherit them)
+load_env_once()
 
 # Configure logging
 setup_logger()
 logger = logging.getLogger(__name__)
 
-def start_bot():
-    """Start the Discord bot only - no web components"""
-    logger.info("Starting Discord bot standalone...")
+def main(argv=None):
+    """Parse command line flags and run the bot (optionally with the web interface)"""
+    parser = argparse.ArgumentParser(description="Run the Gemini Discord bot.")
+    parser.add_argument(
+        "--web",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="also serve the Flask web interface on port 5000",
+    )
+    args = parser.parse_args(argv)
     
-    # Get Discord token from environment variables
-    token = os.getenv("DISCORD_TOKEN")
-    if not token:
-        logger.critical("DISCORD_TOKEN not found in environment variables. Bot cannot start.")
-        sys.exit(1)
+    if not args.web:
+        start("standalone")
+        return
     
-    try:    
-        # Initialize and run the bot
-        bot = GeminiBot()
-        bot.run(token, reconnect=True)
-    except Exception as e:
-        logger.error(f"Error starting bot: {e}")
-        sys.exit(1)
+    os.environ["USE_WEB"] = "1"
+    from app import app
+    
+    bot_thread = threading.Thread(target=start, args=("standalone",), daemon=True)
+    bot_thread.start()
+    app.run(host="0.0.0.0", port=5000, debug=False)
 
 if __name__ == "__main__":
-    # Run the bot
-    start_bot()
-
-# If imported as a module, automatically start the bot
-start_bot()
\ No newline at end of file
+    main()
@@ -29,8 +29,8 @@ print("Starting Discord bot in standalone workflow mode")
 
 # Load environment variables
 try:
-    from dotenv import load_dotenv
-    load_dotenv()
+    from config import load_env_once
+    load_env_once()
     logger.info("Loaded environment variables from .env file")
 except ImportError:
     logger.warning("dotenv package not found, skipping .env file loading")
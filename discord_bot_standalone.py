@@ -7,26 +7,78 @@ It avoids importing Flask entirely to prevent port conflicts.
 
 import os
 import sys
+import time
+import hashlib
+import functools
+import datetime
+import atexit
+import queue
 import logging
+import logging.handlers
 import asyncio
-from dotenv import load_dotenv
+import concurrent.futures
+from collections import OrderedDict
 import discord
 from discord.ext import commands
 import google.generativeai as genai
+from google.api_core.exceptions import NotFound, PermissionDenied
 
-# Set up logging
+from config import (
+    BOT_PREFIX as _BOT_PREFIX,
+    AUTO_RESPONSE_CHANNELS,
+    AUTO_RESPONSE_IGNORE_PREFIX,
+    AUTO_RESPONSE_COOLDOWN,
+    BOT_STATUS,
+    GEMINI_MODEL,
+    GEMINI_TEMPERATURE,
+    GEMINI_SYSTEM_INSTRUCTIONS,
+    GEMINI_CONCURRENCY,
+    GEMINI_TIMEOUT,
+    GEMINI_CONTEXT_CACHE,
+    LOOP_MONITOR_THRESHOLD_MS,
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_THRESHOLD,
+    EMBEDDING_MODEL,
+    load_env_once
+)
+from utils.semantic_cache import EmbeddingBatcher, SemanticCache
+from utils.genai_client import configure_genai
+from launcher import event_loop_factory
+
+# Messages starting with any of these never trigger an auto-response:
+# the ignored prefixes plus the command prefix (commands are handled separately)
+_AUTO_RESPONSE_SKIP_PREFIXES = tuple(AUTO_RESPONSE_IGNORE_PREFIX) + (_BOT_PREFIX,)
+
+# Set up logging; console and file writes happen on a listener thread so the
+# event loop only ever enqueues records
+_log_queue = queue.SimpleQueue()
+_log_listener = logging.handlers.QueueListener(
+    _log_queue,
+    logging.StreamHandler(),
+    logging.FileHandler("discord_bot.log"),
+    respect_handler_level=True
+)
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler("discord_bot.log")
-    ]
+    handlers=[logging.handlers.QueueHandler(_log_queue)]
 )
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
+# Load environment variables (once per process tree; children inherit them)
+load_env_once()
+
+# Recent-prompt cache: identical prompts within the TTL reuse the last answer
+RESPONSE_CACHE_SIZE = 512
+RESPONSE_CACHE_TTL = 300  # seconds
+
+# Explicit context caching of the system instructions (GEMINI_CONTEXT_CACHE). Gemini
+# only accepts cached content above a minimum size, so shorter instructions are never cached.
+CONTEXT_CACHE_MIN_TOKENS = 2048
+CONTEXT_CACHE_TTL = datetime.timedelta(hours=1)
+
 
 class GeminiAIService:
     """Service for interacting with the Gemini AI API."""
@@ -38,66 +90,324 @@ class GeminiAIService:
             logger.error("GEMINI_API_KEY not found in environment variables.")
             raise ValueError("GEMINI_API_KEY not found in environment variables.")
             
-        # Configure the Gemini API
-        genai.configure(api_key=self.api_key)
+        # Configure the Gemini API (shared by every service instance)
+        configure_genai(self.api_key)
         
         # Set up the model
         self.model_name = "gemini-1.5-flash"
         self.model = genai.GenerativeModel(self.model_name)
+        self._context_cache = None
+        self._context_cache_task = None
+        if GEMINI_CONTEXT_CACHE:
+            self._init_context_cache()
+        
+        # Dedicated pool for the remaining blocking work (cache scans, context cache refreshes)
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=GEMINI_CONCURRENCY,
+            thread_name_prefix="gemini"
+        )
+        atexit.register(self._pool.shutdown, wait=False)
+        
+        # (model_name, normalized prompt) -> (monotonic timestamp, response text)
+        self._cache: "OrderedDict[tuple[str, str], tuple[float, str]]" = OrderedDict()
+        self._semantic = SemanticCache(SEMANTIC_CACHE_THRESHOLD) if SEMANTIC_CACHE_ENABLED else None
+        self._embedder = EmbeddingBatcher(EMBEDDING_MODEL) if SEMANTIC_CACHE_ENABLED else None
+        
+        logger.info("Initialized Gemini AI service with model: %s", self.model_name)
+    
+    def _init_context_cache(self) -> None:
+        """Serve the system instructions from a Gemini context cache when they are large enough."""
+        try:
+            from google.generativeai import caching
+            model = genai.GenerativeModel(self.model_name, system_instruction=GEMINI_SYSTEM_INSTRUCTIONS)
+            tokens = model.count_tokens(GEMINI_SYSTEM_INSTRUCTIONS).total_tokens
+            if tokens < CONTEXT_CACHE_MIN_TOKENS:
+                logger.info(
+                    "System instructions are %d tokens (< %d); context caching skipped",
+                    tokens, CONTEXT_CACHE_MIN_TOKENS
+                )
+                return
+            self._context_cache = caching.CachedContent.create(
+                model=f"models/{self.model_name}",
+                system_instruction=GEMINI_SYSTEM_INSTRUCTIONS,
+                ttl=CONTEXT_CACHE_TTL
+            )
+            self.model = genai.GenerativeModel.from_cached_content(self._context_cache)
+            logger.info("Using Gemini context cache %s (%d tokens)", self._context_cache.name, tokens)
+        except Exception as e:
+            logger.warning("Could not set up Gemini context cache: %s", e)
+    
+    def start_context_cache_refresher(self) -> None:
+        """Keep the context cache alive from a background task (call with the event loop running)."""
+        if self._context_cache is not None and self._context_cache_task is None:
+            self._context_cache_task = asyncio.create_task(self._keep_context_cache_alive())
+    
+    async def _keep_context_cache_alive(self) -> None:
+        """Extend the context cache's TTL every half TTL, recreating it if it was lost."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(CONTEXT_CACHE_TTL.total_seconds() / 2)
+            if self._context_cache is None:
+                await loop.run_in_executor(self._pool, self._init_context_cache)
+            else:
+                await loop.run_in_executor(self._pool, self._refresh_context_cache)
+    
+    def _refresh_context_cache(self) -> None:
+        """Extend the context cache's TTL (blocking; run in the pool)."""
+        try:
+            self._context_cache.update(ttl=CONTEXT_CACHE_TTL)
+        except Exception as e:
+            logger.warning("Could not refresh Gemini context cache: %s", e)
+            self._drop_context_cache()
+    
+    def _drop_context_cache(self) -> None:
+        """Send the system instructions with every request until the cache is recreated."""
+        self._context_cache = None
+        self.model = genai.GenerativeModel(self.model_name, system_instruction=GEMINI_SYSTEM_INSTRUCTIONS)
+    
+    async def _generate(self, prompt: str, **kwargs):
+        """
+        Call generate_content_async within GEMINI_TIMEOUT.
         
-        logger.info(f"Initialized Gemini AI service with model: {self.model_name}")
+        If the context cache behind ``self.model`` has expired or been deleted, fall
+        back to an uncached model and retry once; the refresher recreates the cache.
+        """
+        try:
+            return await asyncio.wait_for(
+                self.model.generate_content_async(prompt, **kwargs),
+                timeout=GEMINI_TIMEOUT
+            )
+        except (NotFound, PermissionDenied) as e:
+            if self._context_cache is None:
+                raise
+            logger.warning("Gemini context cache is unavailable (%s); retrying without it", e)
+            self._drop_context_cache()
+            return await asyncio.wait_for(
+                self.model.generate_content_async(prompt, **kwargs),
+                timeout=GEMINI_TIMEOUT
+            )
+    
+    def _remember(self, key: tuple[str, str], text: str) -> None:
+        """Store an answer in the exact-match cache."""
+        self._cache[key] = (time.monotonic(), text)
+        self._cache.move_to_end(key)
+        if len(self._cache) > RESPONSE_CACHE_SIZE:
+            self._cache.popitem(last=False)
+    
+    async def _semantic_lookup(self, key: tuple[str, str]):
+        """
+        Look a prompt up in the semantic cache.
+        
+        Returns ``(text, embedding)``; ``text`` is the cached answer on a hit, and
+        ``embedding`` is kept for storing the answer after a miss. Both are None
+        when the tier is disabled or unavailable.
+        """
+        if self._semantic is None:
+            return None, None
+        try:
+            embedding = await self._embedder.embed(key[1])
+            loop = asyncio.get_running_loop()
+            text = await loop.run_in_executor(self._pool, self._semantic.lookup, embedding)
+        except Exception as e:
+            # The semantic tier is best-effort; fall through to a normal request
+            logger.warning("Semantic cache lookup failed: %s", e)
+            return None, None
+        if text is not None:
+            self._remember(key, text)
+        return text, embedding
+    
+    def _semantic_store(self, key: tuple[str, str], embedding, text: str) -> None:
+        """Store a fresh answer in the semantic cache, if a lookup embedded its prompt."""
+        if embedding is None:
+            return
+        digest = hashlib.sha256(key[1].encode()).hexdigest()
+        self._semantic.store(digest, embedding, text)
+    
+    async def stream_response(self, prompt: str):
+        """Yield a response from the Gemini AI model piece by piece as it is generated."""
+        key = (self.model_name, prompt.strip().lower())
+        cached = self._cache.get(key)
+        if cached and time.monotonic() - cached[0] < RESPONSE_CACHE_TTL:
+            self._cache.move_to_end(key)
+            yield cached[1]
+            return
+        
+        text, embedding = await self._semantic_lookup(key)
+        if text is not None:
+            yield text
+            return
+        
+        parts = []
+        try:
+            stream = await self._generate(prompt, stream=True)
+            # Bound the wait for every chunk, not just the first, so a stalled
+            # stream can't hang the command
+            chunks = aiter(stream)
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(anext(chunks), timeout=GEMINI_TIMEOUT)
+                except StopAsyncIteration:
+                    break
+                parts.append(chunk.text)
+                yield parts[-1]
+        except asyncio.TimeoutError:
+            logger.warning("Gemini did not respond within %ss", GEMINI_TIMEOUT)
+            yield ("\n\n" if parts else "") + "Sorry — Gemini took too long to respond."
+            return
+        except Exception as e:
+            logger.error("Error generating AI response: %s", e)
+            yield f"I encountered an error: {str(e)}"
+            return
+        
+        text = "".join(parts)
+        self._remember(key, text)
+        self._semantic_store(key, embedding, text)
     
     async def generate_response(self, prompt: str) -> str:
         """Generate a response using the Gemini AI model."""
+        key = (self.model_name, prompt.strip().lower())
+        cached = self._cache.get(key)
+        if cached and time.monotonic() - cached[0] < RESPONSE_CACHE_TTL:
+            self._cache.move_to_end(key)
+            return cached[1]
+        
+        text, embedding = await self._semantic_lookup(key)
+        if text is not None:
+            return text
+        
         try:
-            # Convert to async operation
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None, 
-                lambda: self.model.generate_content(prompt)
-            )
+            response = await self._generate(prompt)
             
-            return response.text
+            text = response.text
+            if self._context_cache is not None:
+                logger.debug(
+                    "Gemini cached input tokens: %s",
+                    getattr(response.usage_metadata, "cached_content_token_count", 0)
+                )
+            self._remember(key, text)
+            self._semantic_store(key, embedding, text)
+            return text
+        except asyncio.TimeoutError:
+            logger.warning("Gemini did not respond within %ss", GEMINI_TIMEOUT)
+            return "Sorry — Gemini took too long to respond."
         except Exception as e:
-            logger.error(f"Error generating AI response: {e}")
+            logger.error("Error generating AI response: %s", e)
             return f"I encountered an error: {str(e)}"
 
 
+@functools.lru_cache(maxsize=1)
+def get_ai_service() -> GeminiAIService:
+    """Return the process-wide Gemini AI service, creating it on first use."""
+    return GeminiAIService()
+
+
+# Minimum seconds between edits of a streamed reply (Discord allows about 5 edits per 5s)
+STREAM_EDIT_INTERVAL = 1.0
+
+
+def _split_message(text: str, limit: int) -> list[str]:
+    """Split text into pieces of at most ``limit`` chars, preferring line then word breaks."""
+    chunks = []
+    start = 0
+    while len(text) - start > limit:
+        end = start + limit
+        cut = text.rfind("\n", start, end)
+        if cut <= start:
+            cut = text.rfind(" ", start, end)
+        if cut <= start:
+            cut = end
+        chunks.append(text[start:cut])
+        # Drop the separator we split on so the next chunk doesn't start with it
+        start = cut if cut == end else cut + 1
+    chunks.append(text[start:])
+    return chunks
+
+
+async def _send_chunked(dest_reply, dest_send, text: str, limit: int = 1990):
+    """Send text in Discord-sized chunks, replying with the first one.
+
+    ``limit`` leaves room for the ``(x/y)`` suffix within Discord's
+    2000-char cap; splits land on newlines or spaces where possible so
+    words and code blocks aren't cut in half.
+    """
+    if len(text) <= 2000:
+        await dest_reply(text)
+        return
+    
+    chunks = _split_message(text, limit)
+    total = len(chunks)
+    # Reply with the first chunk to keep the thread, then send the rest one at a
+    # time: concurrent sends can be delivered out of order
+    await dest_reply(f"{chunks[0]}\n(1/{total})")
+    for index, chunk in enumerate(chunks[1:], 2):
+        await dest_send(f"{chunk}\n({index}/{total})")
+
+
 class AICommands(commands.Cog):
     """Commands for interacting with Gemini AI."""
     
     def __init__(self, bot):
         """Initialize the AI commands cog."""
         self.bot = bot
-        self.ai_service = GeminiAIService()
+        self.ai_service = bot.ai_service
+        
+        # The about embed only depends on config, so build it once
+        self._about_base = self._build_about_embed()
     
     @commands.command()
     async def ask(self, ctx, *, prompt: str):
         """Ask Gemini AI a question or provide a prompt."""
-        logger.info(f"User {ctx.author} requested AI response for: {prompt}")
+        logger.info("User %s requested AI response for: %s", ctx.author, prompt)
         
-        # Show typing indicator while generating response
+        # Reply straight away and edit the message as Gemini streams its answer
+        message = await ctx.reply("…")
+        parts = []
+        last_edit = time.monotonic()
         async with ctx.typing():
-            response = await self.ai_service.generate_response(prompt)
+            async for piece in self.ai_service.stream_response(prompt):
+                parts.append(piece)
+                now = time.monotonic()
+                if now - last_edit >= STREAM_EDIT_INTERVAL:
+                    last_edit = now
+                    await message.edit(content="".join(parts)[-1900:])
         
-        # Send the response, splitting if needed to comply with Discord's message limit
+        response = "".join(parts) or "I couldn't generate a response."
         if len(response) <= 2000:
-            await ctx.reply(response)
-        else:
-            # Split the response into chunks of 2000 characters
-            chunks = [response[i:i+2000] for i in range(0, len(response), 2000)]
-            for i, chunk in enumerate(chunks):
-                if i == 0:
-                    await ctx.reply(f"{chunk}\n(1/{len(chunks)})")
-                else:
-                    await ctx.send(f"{chunk}\n({i+1}/{len(chunks)})")
+            await message.edit(content=response)
+            return
+        
+        # Too long for one message: replace the preview with the split response
+        await message.delete()
+        await _send_chunked(ctx.reply, ctx.send, response)
     
     @commands.command()
     async def about(self, ctx):
         """Show information about the Gemini AI bot."""
-        # Import config for auto-response info
-        from config import AUTO_RESPONSE_CHANNELS, GEMINI_MODEL, GEMINI_TEMPERATURE
+        embed = self._about_base.copy()
         
+        # Add field about auto-response channels if configured (channel names are live)
+        if AUTO_RESPONSE_CHANNELS:
+            embed.insert_field_at(
+                1,
+                name="Auto-Response Channels",
+                value=self._render_channels(),
+                inline=False
+            )
+        
+        await ctx.send(embed=embed)
+    
+    def _render_channels(self) -> str:
+        """Describe the auto-response channels for the about embed."""
+        # In a Cog, we access the bot through self.bot
+        parts = (
+            f"<#{cid}> (#{c.name})" if (c := self.bot.get_channel(cid)) else f"<#{cid}>"
+            for cid in AUTO_RESPONSE_CHANNELS
+        )
+        return f"The bot will automatically respond to all messages in these channels:\n{', '.join(parts)}"
+    
+    @staticmethod
+    def _build_about_embed() -> discord.Embed:
+        """Build the static part of the about embed."""
         embed = discord.Embed(
             title="Gemini AI Discord Bot",
             description="A Discord bot powered by Google's Gemini 1.5 AI",
@@ -109,27 +419,6 @@ class AICommands(commands.Cog):
             inline=False
         )
         
-        # Add field about auto-response channels if configured
-        if AUTO_RESPONSE_CHANNELS:
-            channels_info = []
-            for channel_id in AUTO_RESPONSE_CHANNELS:
-                # In a Cog, we access the bot through self.bot
-                channel = self.bot.get_channel(channel_id)
-                if channel:
-                    channels_info.append(f"<#{channel_id}> (#{channel.name})")
-                else:
-                    channels_info.append(f"<#{channel_id}>")
-            
-            auto_response_info = (
-                f"The bot will automatically respond to all messages in these channels:\n"
-                f"{', '.join(channels_info)}"
-            )
-            embed.add_field(
-                name="Auto-Response Channels",
-                value=auto_response_info,
-                inline=False
-            )
-        
         # Add model details
         embed.add_field(
             name="Model",
@@ -151,7 +440,7 @@ class AICommands(commands.Cog):
         
         embed.set_footer(text="Created with ❤️ using discord.py and Google's Generative AI")
         
-        await ctx.send(embed=embed)
+        return embed
 
 
 class GeminiBot(commands.Bot):
@@ -163,21 +452,31 @@ class GeminiBot(commands.Bot):
         intents.message_content = True
         intents.members = True
         
-        # Import here to avoid circular imports
-        from config import BOT_PREFIX
-        
         super().__init__(
-            command_prefix=BOT_PREFIX,
+            command_prefix=_BOT_PREFIX,
             intents=intents,
             help_command=commands.DefaultHelpCommand(),
             description="A Discord bot powered by Google's Gemini 1.5 AI"
         )
         
-        # Add cooldown tracking for auto-response channels
-        self.last_auto_response = {}
+        # One AI service shared by the cog and auto-responses
+        self.ai_service = get_ai_service()
+        
+        # Add cooldown tracking for auto-response channels (monotonic timestamps)
+        self.last_auto_response: dict[int, float] = {}
     
     async def setup_hook(self):
         """Set up the bot's cogs and extensions."""
+        if LOOP_MONITOR_THRESHOLD_MS > 0:
+            # asyncio's debug mode logs every callback slower than slow_callback_duration
+            loop = asyncio.get_running_loop()
+            loop.set_debug(True)
+            loop.slow_callback_duration = LOOP_MONITOR_THRESHOLD_MS / 1000
+            logger.info("Reporting event loop blocks over %sms", LOOP_MONITOR_THRESHOLD_MS)
+        
+        # Extend the Gemini context cache's TTL before it expires
+        self.ai_service.start_context_cache_refresher()
+        
         logger.info("Loading cogs...")
         
         # Add the AI commands cog
@@ -186,15 +485,12 @@ class GeminiBot(commands.Bot):
     
     async def on_ready(self):
         """Called when the bot is ready and connected to Discord."""
-        logger.info(f"Logged in as {self.user} (ID: {self.user.id})")
-        logger.info(f"Discord.py version: {discord.__version__}")
-        logger.info(f"Python version: {sys.version.split()[0]}")
-        logger.info(f"Running on: {sys.platform} {sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro} ({os.name})")
+        logger.info("Logged in as %s (ID: %s)", self.user, self.user.id)
+        logger.info("Discord.py version: %s", discord.__version__)
+        logger.info("Python version: %s", sys.version.split()[0])
+        logger.info("Running on: %s %d.%d.%d (%s)", sys.platform, *sys.version_info[:3], os.name)
         logger.info("-------------------")
         
-        # Import auto-response channels
-        from config import AUTO_RESPONSE_CHANNELS, BOT_STATUS
-        
         # Set activity status
         status_text = BOT_STATUS
         if AUTO_RESPONSE_CHANNELS:
@@ -217,68 +513,55 @@ class GeminiBot(commands.Bot):
         if message.author == self.user:
             return
         
-        # Import here to avoid circular imports
-        from config import (
-            AUTO_RESPONSE_CHANNELS, 
-            AUTO_RESPONSE_IGNORE_PREFIX,
-            AUTO_RESPONSE_COOLDOWN
-        )
-        import time
-            
+        # Bind hot attributes once; this handler runs for every message
+        content = message.content
+        channel = message.channel
+        channel_id = channel.id
+        
         # Auto-respond in designated channels
-        if message.channel.id in AUTO_RESPONSE_CHANNELS:
-            # Skip processing if message starts with an ignored prefix
-            if any(message.content.startswith(prefix) for prefix in AUTO_RESPONSE_IGNORE_PREFIX):
-                pass
-            # Only respond to non-command messages
-            elif not message.content.startswith(self.command_prefix):
-                channel_id = message.channel.id
-                current_time = time.time()
+        if channel_id in AUTO_RESPONSE_CHANNELS:
+            # Only respond to non-command messages without an ignored prefix
+            if not content.startswith(_AUTO_RESPONSE_SKIP_PREFIXES):
+                current_time = time.monotonic()
+                last = self.last_auto_response
+                
+                # Drop stale cooldown entries so the dict stays bounded
+                if len(last) > 1024:
+                    cutoff = current_time - AUTO_RESPONSE_COOLDOWN
+                    last = self.last_auto_response = {
+                        k: v for k, v in last.items() if v > cutoff
+                    }
                 
                 # Check if we're in cooldown for this channel
-                if channel_id in self.last_auto_response:
-                    time_since_last = current_time - self.last_auto_response[channel_id]
+                if channel_id in last:
+                    time_since_last = current_time - last[channel_id]
                     if time_since_last < AUTO_RESPONSE_COOLDOWN:
-                        # Still in cooldown, skip processing
+                        # Still in cooldown, skip processing (this can't be a command either)
                         logger.debug(
-                            f"Skipping auto-response in channel {message.channel.name} due to cooldown "
-                            f"({time_since_last:.1f}s/{AUTO_RESPONSE_COOLDOWN}s)"
+                            "Skipping auto-response in channel %s due to cooldown (%.1fs/%ss)",
+                            channel.name, time_since_last, AUTO_RESPONSE_COOLDOWN
                         )
-                        await self.process_commands(message)
                         return
                 
-                logger.info(f"Auto-responding to {message.author} in channel {message.channel.name}: {message.content}")
+                logger.info("Auto-responding to %s in channel %s: %s", message.author, channel.name, content)
+                
+                # Update cooldown timestamp
+                last[channel_id] = current_time
                 
-                # Get AI cog to use its service
-                ai_cog = self.get_cog("AI Commands")
-                if ai_cog:
-                    prompt = message.content
-                    
-                    # Update cooldown timestamp
-                    self.last_auto_response[channel_id] = current_time
-                    
-                    # Show typing indicator
-                    async with message.channel.typing():
-                        try:
-                            response = await ai_cog.ai_service.generate_response(prompt)
-                            
-                            # Send the response
-                            if len(response) <= 2000:
-                                await message.reply(response)
-                            else:
-                                # Split into chunks for longer responses
-                                chunks = [response[i:i+2000] for i in range(0, len(response), 2000)]
-                                for i, chunk in enumerate(chunks):
-                                    if i == 0:
-                                        await message.reply(f"{chunk}\n(1/{len(chunks)})")
-                                    else:
-                                        await message.channel.send(f"{chunk}\n({i+1}/{len(chunks)})")
-                        except Exception as e:
-                            logger.error(f"Error in auto-response: {e}")
-                            await message.channel.send(f"I encountered an error processing your message: {str(e)}")
-        
-        # Process commands for all messages
-        await self.process_commands(message)
+                # Show typing indicator
+                async with channel.typing():
+                    try:
+                        response = await self.ai_service.generate_response(content)
+                        
+                        # Send the response, splitting longer ones into chunks
+                        await _send_chunked(message.reply, channel.send, response)
+                    except Exception as e:
+                        logger.error("Error in auto-response: %s", e)
+                        await channel.send(f"I encountered an error processing your message: {str(e)}")
+        
+        # Only prefixed messages can be commands; skip the parser for ordinary chatter
+        if content.startswith(_BOT_PREFIX):
+            await self.process_commands(message)
     
     async def on_command_error(self, ctx, error):
         """Handle command errors."""
@@ -289,10 +572,17 @@ class GeminiBot(commands.Bot):
         elif isinstance(error, commands.BadArgument):
             await ctx.send(f"Error: Invalid argument. Try `!help {ctx.command.name}` for more information.")
         else:
-            logger.error(f"Command error: {error}")
+            logger.error("Command error: %s", error)
             await ctx.send(f"An error occurred: {error}")
 
 
+async def _run_bot(token: str) -> None:
+    """Log in and run the bot until it disconnects."""
+    bot = GeminiBot()
+    async with bot:
+        await bot.start(token, reconnect=True)
+
+
 def main():
     """Main entry point to start the bot."""
     # Get Discord token from environment variables
@@ -302,11 +592,13 @@ def main():
         return
     
     try:
-        # Initialize and run the bot
-        bot = GeminiBot()
-        bot.run(token, reconnect=True)
+        # Initialize and run the bot on its own (uvloop when available) event loop
+        with asyncio.Runner(loop_factory=event_loop_factory()) as runner:
+            runner.run(_run_bot(token))
+    except KeyboardInterrupt:
+        logger.info("Bot stopped by user")
     except Exception as e:
-        logger.critical(f"Failed to start bot: {e}")
+        logger.critical("Failed to start bot: %s", e)
         sys.exit(1)
 
 
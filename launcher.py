@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Single launcher for running only the Discord bot (no web interface).
+
+Usage: python launcher.py [standalone|workflow|pythonanywhere|clean]
+
+The older entry scripts (standalone_bot.py, start_discord_bot.py,
+pythonanywhere_bot.py, ...) are thin shims around start().
+"""
+import os
+import sys
+import logging
+
+# standalone/workflow/pythonanywhere run the cog-based bot from bot.py;
+# clean replaces this process with the self-contained clean_bot.py
+MODES = ("standalone", "workflow", "pythonanywhere", "clean")
+
+logger = logging.getLogger(__name__)
+
+def event_loop_factory():
+    """
+    Return uvloop's loop constructor when uvloop is installed (it does not support
+    Windows), else None for asyncio's default loop.
+    
+    Meant for asyncio.Runner(loop_factory=...), so only the bot's own loop uses
+    uvloop and the process-wide event loop policy is left alone.
+    """
+    if sys.platform == "win32":
+        return None
+    try:
+        import uvloop
+    except ImportError:
+        return None
+    logger.info("Using uvloop event loop")
+    return uvloop.new_event_loop
+
+def start(mode="standalone"):
+    """Start the Discord bot in the given mode."""
+    if mode not in MODES:
+        raise ValueError(f"Unknown launch mode {mode!r}; expected one of {', '.join(MODES)}")
+    
+    if mode == "clean":
+        # Replace this process outright; nothing from this interpreter is reused
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "clean_bot.py")
+        os.execv(sys.executable, [sys.executable, script])
+    
+    # Load environment variables (once per process tree; children inherit them)
+    from config import load_env_once
+    load_env_once()
+    
+    # Configure logging unless the caller already did
+    if not logging.getLogger().handlers:
+        from utils.logger import setup_logger
+        setup_logger()
+    
+    if mode == "pythonanywhere":
+        # Identify that we're running on PythonAnywhere
+        os.environ.setdefault("PYTHONANYWHERE_DOMAIN", "true")
+    
+    logger.info(f"Starting Discord bot ({mode} mode)...")
+    
+    # Get Discord token from environment variables
+    token = os.getenv("DISCORD_TOKEN")
+    if not token:
+        logger.critical("DISCORD_TOKEN not found in environment variables. Bot cannot start.")
+        sys.exit(1)
+    
+    from bot import run_bot
+    
+    try:
+        # Initialize and run the bot (rate-limited logins are retried)
+        run_bot(token)
+    except Exception as e:
+        logger.error(f"Error starting bot: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    start(sys.argv[1] if len(sys.argv) > 1 else "standalone")
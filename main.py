@@ -6,46 +6,49 @@ This file initializes and runs the bot.
 It also provides the Flask application for web hosting when imported by gunicorn.
 """
 import os
+import re
 import logging
 import threading
 import sys
-import subprocess
 
 # ========================================================
 # DISCORD BOT WORKFLOW DETECTION - IMMEDIATE REDIRECTION
 # This runs before anything else to prevent port conflicts
 # ========================================================
 
-# We put this at the very top, before any imports that might 
-# cause conflicts, to correctly identify and redirect to the standalone script
-argv_str = " ".join(sys.argv).lower() if sys.argv else ""
-script_name = sys.argv[0].lower() if sys.argv else ""
-env_workflow = os.environ.get("REPL_WORKFLOW_NAME", "").lower()
+# Command line fragments that mean we were launched as the bot-only workflow
+_BOT_ONLY_RE = re.compile(r"run_discord_bot\.sh|discord_bot_standalone\.py|clean_bot\.py", re.IGNORECASE)
+_GUNICORN_RE = re.compile(r"gunicorn", re.IGNORECASE)
 
-# Use explicit environment flag for most reliable detection
-discord_bot_env = os.environ.get("DISCORD_BOT_WORKFLOW_ONLY", "0") == "1"
+# Set DEBUG_STARTUP=1 to print how the startup mode was chosen
+DEBUG_STARTUP = os.environ.get("DEBUG_STARTUP", "0") == "1"
 
-# VERY specific detection for the run_discord_bot workflow
-# This should ONLY match when we're truly in the discord bot workflow
-if (discord_bot_env or                                           # Explicit flag
-    (env_workflow == "run_discord_bot") or                        # Exact workflow name match
-    ("run_discord_bot.sh" in argv_str) or                         # Script name match
-    ("discord_bot_standalone.py" in argv_str) or                  # Explicit standalone script
-    ("clean_bot.py" in argv_str) or                               # Our new clean bot script
-    (os.path.exists("bot.pid") and not                           # PID file exists AND
-     (sys.argv and "gunicorn" in " ".join(sys.argv).lower()))):  # NOT gunicorn
+def _detect_mode():
+    """Return "bot" when this process should only run the Discord bot, otherwise "web"."""
+    environ = os.environ
+    argv_str = " ".join(sys.argv)
+    
+    # VERY specific detection for the run_discord_bot workflow, cheapest checks first
+    if (environ.get("DISCORD_BOT_WORKFLOW_ONLY", "0") == "1" or                # Explicit flag
+            environ.get("REPL_WORKFLOW_NAME", "").lower() == "run_discord_bot" or  # Exact workflow name
+            _BOT_ONLY_RE.search(argv_str)):                                    # Script name match
+        return "bot"
+    
+    # A PID file left by the bot workflow, unless we're being served by gunicorn
+    if not _GUNICORN_RE.search(argv_str) and os.path.exists("bot.pid"):
+        return "bot"
+    
+    return "web"
+
+MODE = _detect_mode()
 
+if MODE == "bot":
     # Avoid importing the app if we're in the discord bot workflow
-    print("=" * 80)
-    print("VERY EARLY DETECTION: DISCORD BOT WORKFLOW DETECTED!")
-    print("REDIRECTING TO STANDALONE BOT - AVOIDING PORT CONFLICTS")
-    print("=" * 80)
-    
-    # Create a process ID file to mark this as a bot process
-    with open("bot.pid", "w") as f:
-        f.write(str(os.getpid()))
+    if DEBUG_STARTUP:
+        print("Discord bot workflow detected; redirecting to clean_bot.py")
     
     # Use os.execv for a clean replacement of the current process
+    # (clean_bot.py writes bot.pid itself; execv keeps the same PID)
     os.execv(sys.executable, [sys.executable, "clean_bot.py"])
     
     # Failsafe in case execv doesn't work
@@ -56,15 +59,12 @@ from utils.logger import setup_logger
 setup_logger()
 logger = logging.getLogger(__name__)
 
-# Print workflow information for debugging
-print("=" * 50)
-print(f"WORKFLOW: {os.environ.get('REPL_WORKFLOW_NAME', 'unknown')}")
-print(f"ARGV: {sys.argv}")
-print("=" * 50)
+if DEBUG_STARTUP:
+    logger.info(f"Startup mode: {MODE} (workflow: {os.environ.get('REPL_WORKFLOW_NAME', 'unknown')}, argv: {sys.argv})")
 
 # Load environment variables
-from dotenv import load_dotenv
-load_dotenv()
+from config import load_env_once
+load_env_once()
 
 # Set database URL if needed
 if "DATABASE_URL" not in os.environ and all(key in os.environ for key in ["PGUSER", "PGPASSWORD", "PGHOST", "PGPORT", "PGDATABASE"]):
@@ -80,10 +80,6 @@ if "DATABASE_URL" not in os.environ and all(key in os.environ for key in ["PGUSE
 # Import Flask and bot
 from app import app
 
-# Import what we need for the bot
-import discord
-from bot import GeminiBot
-
 def start_bot():
     """Start the Discord bot in a separate thread"""
     logger.info("Starting Gemini Discord Bot...")
@@ -94,19 +90,13 @@ def start_bot():
         logger.critical("DISCORD_TOKEN not found in environment variables. Bot cannot start.")
         return
     
+    # Imported only once the token is known to exist, so a misconfigured
+    # deployment fails fast without loading discord, Gemini and the models.
+    from bot import run_bot
+    
     try:    
-        # Initialize and run the bot
-        bot = GeminiBot()
-        # Add retry strategy for handling rate limits
-        bot.run(token, reconnect=True)
-    except discord.errors.HTTPException as e:
-        if e.status == 429:  # Rate limit error
-            logger.warning(f"Discord rate limit exceeded. Try again later: {e}")
-            # Sleep for a bit to allow rate limits to reset
-            import time
-            time.sleep(60)  # Wait 60 seconds before trying again
-        else:
-            logger.error(f"Discord HTTP error: {e}")
+        # Initialize and run the bot (rate-limited logins are retried)
+        run_bot(token)
     except Exception as e:
         logger.error(f"Error starting bot: {e}")
 
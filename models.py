@@ -2,16 +2,25 @@
 Models for the Discord bot database integration
 """
 from datetime import datetime
+import json
 import os
-from sqlalchemy import ForeignKey, create_engine, Column, Integer, String, Boolean, DateTime, Text
-from sqlalchemy.orm import Mapped, mapped_column, relationship, declarative_base
-
-# Try to import from Flask app context first
-try:
-    from app import db
-    USING_FLASK_APP = True
-except (ImportError, RuntimeError):
-    USING_FLASK_APP = False
+from sqlalchemy import DDL, JSON, ForeignKey, event, Index, delete, func, insert, inspect, lambda_stmt, select, text, update, create_engine, Column, Integer, String, Boolean, DateTime, Text
+from sqlalchemy.orm import Mapped, column_property, mapped_column, relationship, declarative_base, raiseload, selectinload
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import StaticPool
+
+# Only use the Flask app's database when running the web interface (USE_WEB=1).
+# Bot-only entry points never import Flask at all.
+USING_FLASK_APP = False
+if os.getenv("USE_WEB", "0") == "1":
+    try:
+        from app import db
+        USING_FLASK_APP = True
+    except (ImportError, RuntimeError):
+        pass
+
+if not USING_FLASK_APP:
     # Set up standalone SQLAlchemy for non-Flask usage
     Base = declarative_base()
     
@@ -21,9 +30,61 @@ except (ImportError, RuntimeError):
         # Fallback to SQLite for development/testing
         DATABASE_URL = "sqlite:///discord_bot.db"
     
-    engine = create_engine(DATABASE_URL)
+    if DATABASE_URL.startswith("sqlite"):
+        # SQLite has no server to pool connections to; just allow use across threads.
+        # An in-memory database only exists on its connection, so share a single one.
+        engine_options = {"connect_args": {"check_same_thread": False}}
+        if ":memory:" in DATABASE_URL or DATABASE_URL in ("sqlite://", "sqlite:///"):
+            engine_options["poolclass"] = StaticPool
+    else:
+        # Keep warm connections for concurrent event handlers and drop stale ones
+        engine_options = {
+            "pool_size": 10,
+            "max_overflow": 20,
+            "pool_timeout": 30,
+            "pool_recycle": 1800,
+            "pool_pre_ping": True,
+            # Batch executemany inserts (e.g. bulk_add_messages) into multi-row
+            # INSERT ... VALUES statements
+            "use_insertmanyvalues": True,
+            "insertmanyvalues_page_size": 1000,
+        }
+        driver = make_url(DATABASE_URL).get_driver_name()
+        if driver == "psycopg2":
+            engine_options["executemany_mode"] = "values_plus_batch"
+        elif driver == "psycopg":
+            # Server-side prepare statements after they've run a few times
+            engine_options["connect_args"] = {"prepare_threshold": 5}
+    
+    # (De)serialize JSON columns such as Conversation.tags with orjson when it is installed
+    try:
+        import orjson
+    except ImportError:
+        pass
+    else:
+        engine_options["json_serializer"] = lambda value: orjson.dumps(value).decode()
+        engine_options["json_deserializer"] = orjson.loads
+    
+    engine = create_engine(DATABASE_URL, **engine_options)
     from sqlalchemy.orm import sessionmaker
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    # expire_on_commit=False: objects returned from a finished session_scope stay readable
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, expire_on_commit=False)
+
+
+# Set BOT_STRICT_ORM=1 in development to turn unplanned lazy loads (N+1 queries) into errors
+STRICT_ORM = os.getenv("BOT_STRICT_ORM", "0") == "1"
+
+def strict_load(stmt, *loaders):
+    """
+    Apply eager-loading options to a select() or query.
+    
+    Under BOT_STRICT_ORM every relationship not covered by ``loaders`` raises
+    on access instead of lazy loading, e.g.
+    ``session.execute(strict_load(select(Conversation), selectinload(Conversation.messages)))``.
+    """
+    if STRICT_ORM:
+        loaders += (raiseload("*"),)
+    return stmt.options(*loaders) if loaders else stmt
 
 
 # Define the base class for models
@@ -32,22 +93,28 @@ if USING_FLASK_APP:
 else:
     ModelBase = Base
 
+# Fetch server-generated timestamps as part of the INSERT/UPDATE (RETURNING where
+# supported) instead of lazily re-selecting them on first access
+EAGER_DEFAULTS = {"eager_defaults": True}
+
 class User(ModelBase):
     """
     Discord user information
     """
     __tablename__ = 'users'
+    __mapper_args__ = EAGER_DEFAULTS
     
     id: Mapped[int] = mapped_column(primary_key=True)
     discord_id: Mapped[int] = mapped_column(unique=True, index=True)
     username: Mapped[str] = mapped_column()
-    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow, server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(default=datetime.utcnow, server_default=func.now(), onupdate=func.now())
     
     # Relationships
     conversations = relationship("Conversation", back_populates="user", cascade="all, delete-orphan")
     messages = relationship("Message", back_populates="user", cascade="all, delete-orphan")
-    settings = relationship("UserSettings", back_populates="user", uselist=False, cascade="all, delete-orphan")
+    # One-to-one and read whenever settings are: load it in the same query as the user
+    settings = relationship("UserSettings", back_populates="user", uselist=False, lazy="joined", cascade="all, delete-orphan")
     
     def __repr__(self):
         return f"<User discord_id={self.discord_id}, username={self.username}>"
@@ -58,6 +125,7 @@ class UserSettings(ModelBase):
     User-specific settings for the Discord bot
     """
     __tablename__ = 'user_settings'
+    __mapper_args__ = EAGER_DEFAULTS
     
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), unique=True)
@@ -67,8 +135,8 @@ class UserSettings(ModelBase):
     default_mood: Mapped[str] = mapped_column(default="thoughtful")
     auto_title_conversations: Mapped[bool] = mapped_column(default=True)  # Auto-generate titles for conversations
     dm_conversation_preview: Mapped[bool] = mapped_column(default=True)   # Send conversation preview as DM
-    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow, server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(default=datetime.utcnow, server_default=func.now(), onupdate=func.now())
     
     # Relationships
     user = relationship("User", back_populates="settings")
@@ -82,12 +150,13 @@ class Channel(ModelBase):
     Discord channel information
     """
     __tablename__ = 'channels'
+    __mapper_args__ = EAGER_DEFAULTS
     
     id: Mapped[int] = mapped_column(primary_key=True)
     discord_id: Mapped[int] = mapped_column(unique=True, index=True)
     name: Mapped[str] = mapped_column(nullable=True)
-    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow, server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(default=datetime.utcnow, server_default=func.now(), onupdate=func.now())
     
     # Relationships
     conversations = relationship("Conversation", back_populates="channel", cascade="all, delete-orphan")
@@ -101,6 +170,14 @@ class Conversation(ModelBase):
     Conversation model to group messages
     """
     __tablename__ = 'conversations'
+    __table_args__ = (
+        # A user's conversations, most recently active first
+        Index('ix_conversations_user_updated', 'user_id', 'updated_at'),
+        Index('ix_conversations_channel_id', 'channel_id'),
+        # Tag containment lookups (Conversation.tags.contains([...])) on PostgreSQL
+        Index('ix_conv_tags_gin', 'tags', postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
+    __mapper_args__ = EAGER_DEFAULTS
     
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=True)
@@ -108,20 +185,24 @@ class Conversation(ModelBase):
     mood: Mapped[str] = mapped_column(default="thoughtful")
     energy_level: Mapped[int] = mapped_column(default=3)
     title: Mapped[str] = mapped_column(nullable=True)  # User-defined conversation title
-    tags: Mapped[str] = mapped_column(nullable=True)   # Comma-separated tags for the conversation
+    # Tags for the conversation: a native array on PostgreSQL, JSON elsewhere.
+    # Assign a new list when changing tags; in-place mutation is not tracked.
+    tags: Mapped[list[str]] = mapped_column(
+        JSON().with_variant(ARRAY(String), "postgresql"), nullable=True, default=list)
     is_archived: Mapped[bool] = mapped_column(default=False)  # Whether this conversation is archived
-    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow, server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(default=datetime.utcnow, server_default=func.now(), onupdate=func.now())
     
     # Relationships
     user = relationship("User", back_populates="conversations")
     channel = relationship("Channel", back_populates="conversations")
-    messages = relationship("Message", back_populates="conversation", order_by="Message.created_at", cascade="all, delete-orphan")
+    # Unordered: queries that need history order it explicitly (see DatabaseConversationService)
+    messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
     
     def __repr__(self):
         if self.user_id:
-            return f"<Conversation user_id={self.user_id}, messages={len(self.messages)}>"
-        return f"<Conversation channel_id={self.channel_id}, messages={len(self.messages)}>"
+            return f"<Conversation user_id={self.user_id}, messages={self.message_count}>"
+        return f"<Conversation channel_id={self.channel_id}, messages={self.message_count}>"
 
 
 class Message(ModelBase):
@@ -129,14 +210,22 @@ class Message(ModelBase):
     Individual message in a conversation
     """
     __tablename__ = 'messages'
+    __table_args__ = (
+        # History for a conversation in chronological order. The id tie-breaker matches
+        # the ORDER BY of load_context/load_turns/trim_history, so those read the index in
+        # order without a sort, and trim_history's id subquery is an index-only scan.
+        Index('ix_messages_conv_created', 'conversation_id', 'created_at', 'id'),
+    )
+    __mapper_args__ = EAGER_DEFAULTS
     
     id: Mapped[int] = mapped_column(primary_key=True)
-    conversation_id: Mapped[int] = mapped_column(ForeignKey("conversations.id"))
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=True)
+    # ON DELETE CASCADE so a Core DELETE of conversations takes their messages with it
+    conversation_id: Mapped[int] = mapped_column(ForeignKey("conversations.id", ondelete="CASCADE"))
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=True, index=True)
     role: Mapped[str] = mapped_column()  # 'user' or 'assistant'
-    content: Mapped[str] = mapped_column()
+    content: Mapped[str] = mapped_column(Text)  # AI replies can run to tens of KB
     author_name: Mapped[str] = mapped_column(nullable=True)
-    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow, server_default=func.now())
     
     # Relationships
     conversation = relationship("Conversation", back_populates="messages")
@@ -146,10 +235,230 @@ class Message(ModelBase):
         return f"<Message role={self.role}, conversation_id={self.conversation_id}>"
 
 
+# Message count as a correlated subquery; deferred, so it is only selected when
+# accessed or when a query asks for it with undefer(Conversation.message_count)
+Conversation.message_count = column_property(
+    select(func.count(Message.id))
+    .where(Message.conversation_id == Conversation.id)
+    .correlate_except(Message)
+    .scalar_subquery(),
+    deferred=True,
+)
+
+# Let PostgreSQL compress long message bodies out of line (TOAST) when the table is created
+event.listen(
+    Message.__table__,
+    "after_create",
+    DDL("ALTER TABLE messages ALTER COLUMN content SET STORAGE EXTENDED").execute_if(dialect="postgresql"),
+)
+
+
+def _upsert_insert(session):
+    """Return the dialect's INSERT ... ON CONFLICT construct, or None if it has none."""
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert
+
+
+def upsert_user(session, discord_id, username):
+    """
+    Get or create the User for a Discord ID, making sure it has a settings row.
+    
+    On PostgreSQL and SQLite this is a single INSERT ... ON CONFLICT ... RETURNING
+    (plus an ON CONFLICT DO NOTHING for the settings) instead of SELECT-then-INSERT,
+    so concurrent first messages can't race into an IntegrityError. An empty
+    ``username`` never overwrites a stored one.
+    """
+    dialect_insert = _upsert_insert(session)
+    if dialect_insert is None:
+        user = session.query(User).filter_by(discord_id=discord_id).first()
+        if not user:
+            user = User(discord_id=discord_id, username=username)
+            session.add(user)
+            session.flush()  # Flush to get the ID
+            session.add(UserSettings(user_id=user.id, personality="balanced"))
+        return user
+    
+    stmt = dialect_insert(User).values(discord_id=discord_id, username=username)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[User.discord_id],
+        set_={"username": func.coalesce(func.nullif(stmt.excluded.username, ""), User.username)}
+    ).returning(User)
+    user = session.scalars(stmt, execution_options={"populate_existing": True}).one()
+    
+    session.execute(
+        dialect_insert(UserSettings)
+        .values(user_id=user.id, personality="balanced")
+        .on_conflict_do_nothing(index_elements=[UserSettings.user_id])
+    )
+    return user
+
+
+def load_context(session, conversation_id, limit=50, with_users=False):
+    """
+    Return the last ``limit`` messages of a conversation, oldest first.
+    
+    One query for the messages; with ``with_users`` the authors' usernames come
+    from a single extra SELECT ... IN rather than one lazy load per message.
+    """
+    stmt = (select(Message)
+            .where(Message.conversation_id == conversation_id)
+            .order_by(Message.created_at.desc(), Message.id.desc())
+            .limit(limit))
+    if with_users:
+        stmt = stmt.options(selectinload(Message.user).load_only(User.username))
+    messages = session.scalars(stmt).all()
+    return messages[::-1]
+
+
+def load_turns(session, conversation_id, limit=50):
+    """
+    Return ``(role, content)`` rows for the last ``limit`` messages, oldest first.
+    
+    Like load_context(), but selects the two columns as plain Row tuples, so
+    no Message instances are built or added to the identity map.
+    """
+    rows = session.execute(
+        select(Message.role, Message.content)
+        .where(Message.conversation_id == conversation_id)
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(limit)
+    ).all()
+    return rows[::-1]
+
+
+def bulk_add_messages(session, rows):
+    """
+    Insert several messages in one executemany (e.g. a user message and its reply).
+    
+    ``rows`` are dicts of Message column values. The caller's transaction is
+    left open; session_scope() commits it.
+    """
+    if rows:
+        session.execute(insert(Message), rows)
+
+
+def trim_history(session, conversation_id, keep=50):
+    """
+    Delete all but the newest ``keep`` messages of a conversation.
+    
+    A single DELETE ... WHERE id IN (newest-first ids past ``keep``); no rows are
+    loaded into Python.
+    """
+    stale = (select(Message.id)
+             .where(Message.conversation_id == conversation_id)
+             .order_by(Message.created_at.desc(), Message.id.desc())
+             .offset(keep)
+             .subquery())
+    session.execute(
+        delete(Message).where(Message.id.in_(select(stale.c.id))),
+        execution_options={"synchronize_session": False}
+    )
+
+
+
+def touch_conversation(session, conversation_id):
+    """
+    Set a conversation's ``updated_at`` to the database's now() with one UPDATE.
+    
+    The Conversation row is not loaded; an instance already in the session keeps
+    its old ``updated_at`` value. This runs for every stored message, so it is a
+    lambda statement: the construct is built and compiled once and later calls
+    only bind ``conversation_id``.
+    """
+    conversations = Conversation.__table__
+    session.execute(lambda_stmt(
+        lambda: update(conversations)
+        .where(conversations.c.id == conversation_id)
+        .values(updated_at=func.now())
+    ))
+
+
+
+def migrate_legacy_tags(bind):
+    """
+    Convert ``conversations.tags`` from the old comma-separated string column.
+    
+    Safe to run on every start, after create_all(). On PostgreSQL a VARCHAR column
+    is retyped to VARCHAR[] (and given its GIN index, which create_all() skips
+    for existing tables); elsewhere each CSV value is rewritten in place as a
+    JSON list. Tables already in the new format are left untouched.
+    """
+    inspector = inspect(bind)
+    if "conversations" not in inspector.get_table_names():
+        return
+    column = next((c for c in inspector.get_columns("conversations") if c["name"] == "tags"), None)
+    if column is None:
+        return
+    
+    with bind.begin() as conn:
+        if bind.dialect.name == "postgresql":
+            if not isinstance(column["type"], ARRAY):
+                conn.execute(text(
+                    "ALTER TABLE conversations ALTER COLUMN tags TYPE VARCHAR[] "
+                    "USING array_remove(string_to_array(tags, ','), '')"
+                ))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_conv_tags_gin ON conversations USING gin (tags)"))
+            return
+        
+        # JSON lists start with '['; anything else is a legacy CSV string (or a JSON null)
+        rows = conn.execute(text(
+            "SELECT id, tags FROM conversations WHERE tags IS NOT NULL AND tags NOT LIKE '[%'"
+        )).all()
+        updates = []
+        for conversation_id, raw in rows:
+            try:
+                if json.loads(raw) is None:
+                    continue
+            except ValueError:
+                pass
+            updates.append({"id": conversation_id, "tags": json.dumps([tag for tag in raw.split(",") if tag])})
+        if updates:
+            conn.execute(text("UPDATE conversations SET tags = :tags WHERE id = :id"), updates)
+
+
+# Tables whose timestamp columns gained a server-side default
+_TIMESTAMP_COLUMNS = {
+    "users": ("created_at", "updated_at"),
+    "user_settings": ("created_at", "updated_at"),
+    "channels": ("created_at", "updated_at"),
+    "conversations": ("created_at", "updated_at"),
+    "messages": ("created_at",),
+}
+
+
+def migrate_timestamp_defaults(bind):
+    """
+    Give existing ``created_at``/``updated_at`` columns their ``now()`` default.
+    
+    Safe to run on every start, after create_all(), which never alters existing
+    tables. Only PostgreSQL can add a default in place; SQLite columns keep
+    relying on the ORM's Python-side default, which every model still sets.
+    """
+    if bind.dialect.name != "postgresql":
+        return
+    inspector = inspect(bind)
+    existing = set(inspector.get_table_names())
+    with bind.begin() as conn:
+        for table, columns in _TIMESTAMP_COLUMNS.items():
+            if table not in existing:
+                continue
+            for column in inspector.get_columns(table):
+                if column["name"] in columns and not column.get("default"):
+                    conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column['name']} SET DEFAULT now()"))
+
+
 # Initialize tables for standalone mode
 if not USING_FLASK_APP:
-    # Create all tables
+    # Create all tables, then bring older databases' columns up to date
     Base.metadata.create_all(bind=engine)
+    migrate_legacy_tags(engine)
+    migrate_timestamp_defaults(engine)
     
     # Function to get a database session
     def get_db():
@@ -7,7 +7,7 @@ to avoid port conflicts on PythonAnywhere.
 import os
 import time
 import logging
-from dotenv import load_dotenv
+from config import load_env_once
 
 # Setup logging
 logging.basicConfig(
@@ -20,11 +20,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Upper bound on the wait between restart attempts, in seconds
+MAX_RESTART_DELAY = 300
+
 def main():
     """Main entry point for PythonAnywhere deployment."""
     # Load environment variables from .env file if it exists
     if os.path.exists(".env"):
-        load_dotenv()
+        load_env_once()
         logger.info("Loaded environment variables from .env file")
     
     # Check for Discord token
@@ -44,18 +47,24 @@ def main():
     logger.info("Starting Discord bot on PythonAnywhere...")
     print("Starting Discord bot on PythonAnywhere...")
     
-    # Import and run the clean bot
-    try:
-        from clean_bot import main as start_bot
-        start_bot()
-    except Exception as e:
-        logger.critical(f"Failed to start bot: {e}")
-        print(f"ERROR: Failed to start bot: {e}")
+    # Import and run the clean bot, restarting with exponential backoff on failure.
+    # bot.run() closes the Discord client before returning or raising, so nothing
+    # from a failed attempt is carried into the next one.
+    backoff = 1
+    while True:
+        try:
+            from clean_bot import main as start_bot
+            start_bot()
+            return
+        except Exception as e:
+            logger.critical(f"Failed to start bot: {e}", exc_info=True)
+            print(f"ERROR: Failed to start bot: {e}")
         
         # Wait a bit before restarting
-        time.sleep(10)
-        logger.info("Attempting to restart...")
-        main()  # Try again
+        delay = min(10 * backoff, MAX_RESTART_DELAY)
+        logger.info(f"Attempting to restart in {delay} seconds...")
+        time.sleep(delay)
+        backoff = min(backoff * 2, MAX_RESTART_DELAY // 10)
 
 if __name__ == "__main__":
     print("=" * 50)
@@ -1,3 +1,3 @@
 #!/bin/bash
 # This script starts only the Discord bot without the web interface
-python discord_bot_only.py
+python discord_bot.py
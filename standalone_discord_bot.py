@@ -8,35 +8,6 @@ import sys
 import logging
 import asyncio
 
-# First, mock Flask completely
-from types import ModuleType
-
-class DisabledFlask:
-    def __init__(self, *args, **kwargs):
-        pass
-    
-    def route(self, *args, **kwargs):
-        def decorator(f):
-            return f
-        return decorator
-    
-    def run(self, *args, **kwargs):
-        pass
-    
-    def __getattr__(self, name):
-        return lambda *args, **kwargs: None
-
-class DisabledSQLAlchemy:
-    def __init__(self, *args, **kwargs):
-        pass
-    
-    def __getattr__(self, name):
-        return lambda *args, **kwargs: None
-
-# Mock all Flask-related modules
-sys.modules['flask'] = DisabledFlask
-sys.modules['flask_sqlalchemy'] = DisabledSQLAlchemy
-
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -49,8 +20,8 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Load environment variables
-from dotenv import load_dotenv
-load_dotenv()
+from config import load_env_once
+load_env_once()
 
 # Import Discord modules
 import discord
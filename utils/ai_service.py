@@ -1,27 +1,58 @@
 """
 AI service module for interacting with Google's Gemini 1.5 API.
 """
+import time
 import logging
 import asyncio
 import random
-from typing import List, Dict, Optional, Tuple, Union
+import hashlib
+import contextlib
+import functools
+from collections import OrderedDict
+from typing import AsyncIterator, List, Dict, Optional, Tuple, Union
 
 import google.generativeai as genai
+from google.api_core.exceptions import InternalServerError, ResourceExhausted, ServiceUnavailable
 from config import (
     GEMINI_API_KEY, 
     GEMINI_MODEL,
     GEMINI_MAX_TOKENS,
+    GEMINI_MAX_INPUT_TOKENS,
     GEMINI_TEMPERATURE,
     GEMINI_TOP_P,
     GEMINI_TOP_K,
     GEMINI_SYSTEM_INSTRUCTIONS,
+    GEMINI_CONCURRENCY,
     ENABLE_CONVERSATION_MEMORY,
-    ENABLE_MOOD_INDICATOR
+    ENABLE_MOOD_INDICATOR,
+    CONVERSATION_MEMORY_EXPIRY,
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_THRESHOLD,
+    EMBEDDING_MODEL
 )
-from utils.conversation_memory import conversation_manager, Message
+from utils.conversation_memory import conversation_manager, estimate_tokens, Message
+from utils.genai_client import configure_genai
+from utils.semantic_cache import EmbeddingBatcher, SemanticCache
 
 logger = logging.getLogger(__name__)
 
+# API errors worth retrying: rate limiting (429) and server-side failures (500/503)
+TRANSIENT_ERRORS = (ResourceExhausted, InternalServerError, ServiceUnavailable)
+GEMINI_MAX_RETRIES = 4
+MAX_RETRY_DELAY = 30  # seconds
+
+# Entries kept in the exact-match response cache
+EXACT_CACHE_SIZE = 2048
+
+# Number of trailing conversation turns (including the new prompt) that make up a semantic cache key
+SEMANTIC_CACHE_TURNS = 3
+
+def _extract_text(response) -> str:
+    """Get the text of a Gemini response (or streamed chunk), falling back to its first part."""
+    text = getattr(response, "text", None)
+    return text if text is not None else response.candidates[0].content.parts[0].text
+
+
 class GeminiAIService:
     """Service class for interacting with Gemini 1.5 AI."""
     
@@ -31,8 +62,8 @@ class GeminiAIService:
             logger.critical("GEMINI_API_KEY not found in environment variables. AI service cannot initialize.")
             raise ValueError("GEMINI_API_KEY is required")
         
-        # Configure the Gemini API client
-        genai.configure(api_key=GEMINI_API_KEY)
+        # Configure the Gemini API client (shared by every service instance)
+        configure_genai(GEMINI_API_KEY)
         
         # Store model configuration
         self.model_name = GEMINI_MODEL
@@ -46,6 +77,32 @@ class GeminiAIService:
         # System instructions for the AI
         self.system_instructions = GEMINI_SYSTEM_INSTRUCTIONS
         
+        # Tokens left for conversation history once the instructions and the reply are accounted for
+        self.history_token_budget = max(
+            GEMINI_MAX_INPUT_TOKENS - GEMINI_MAX_TOKENS - estimate_tokens(self.system_instructions), 0
+        )
+        
+        # One model instance serves every request; the instructions are sent as its system instruction
+        self.model = genai.GenerativeModel(
+            model_name=self.model_name,
+            generation_config=self.generation_config,
+            system_instruction=self.system_instructions
+        )
+        
+        # Concurrent Gemini requests allowed at once (across every conversation)
+        self._request_slots = asyncio.Semaphore(GEMINI_CONCURRENCY)
+        
+        # (conversation, previous turn, prompt) -> (monotonic timestamp, answer), least recently used first
+        self._exact_cache: "OrderedDict[Tuple, Tuple[float, str]]" = OrderedDict()
+        
+        # Answers reused for near-identical recent context (see SEMANTIC_CACHE_ENABLED)
+        self._semantic_cache = (
+            SemanticCache(SEMANTIC_CACHE_THRESHOLD, ttl_seconds=CONVERSATION_MEMORY_EXPIRY)
+            if SEMANTIC_CACHE_ENABLED else None
+        )
+        # Prompts from concurrent requests share one embedding call
+        self._embedder = EmbeddingBatcher(EMBEDDING_MODEL) if SEMANTIC_CACHE_ENABLED else None
+        
         logger.info(f"Initialized Gemini AI service with model: {self.model_name}")
     
     async def generate_response(self, prompt: str, user_id: Optional[int] = None, 
@@ -66,102 +123,229 @@ class GeminiAIService:
             Exception: If there's an error in generating the response.
         """
         try:
-            conversation_preview = None
-            conversation_history = None
-            mood_prefix = ""
-            mood_suffix = ""
-            mood_emoji = ""
-            
-            # Handle conversation memory if enabled
-            if ENABLE_CONVERSATION_MEMORY:
-                if user_id:
-                    # User-specific conversation
-                    conversation = conversation_manager.get_user_conversation(user_id)
-                    conversation_manager.add_user_message(user_id, prompt, author_name)
-                    conversation_history = conversation.get_formatted_history()
-                    conversation_preview = conversation_manager.get_user_conversation_preview(user_id)
-                    
-                    # Get mood information if enabled
-                    if ENABLE_MOOD_INDICATOR:
-                        conversation.maybe_change_mood()
-                        mood_prefix, mood_suffix = conversation.get_mood_decorator()
-                        mood_emoji = conversation.get_mood_emoji()
-                        
-                elif channel_id:
-                    # Channel-specific conversation
-                    conversation = conversation_manager.get_channel_conversation(channel_id)
-                    conversation_manager.add_channel_user_message(channel_id, user_id or 0, prompt, author_name)
-                    conversation_history = conversation.get_formatted_history()
-                    conversation_preview = conversation_manager.get_channel_conversation_preview(channel_id)
-                    
-                    # Get mood information if enabled
-                    if ENABLE_MOOD_INDICATOR:
-                        conversation.maybe_change_mood()
-                        mood_prefix, mood_suffix = conversation.get_mood_decorator()
-                        mood_emoji = conversation.get_mood_emoji()
-            
-            # Create a new model instance with the specified configuration
-            model = genai.GenerativeModel(
-                model_name=self.model_name,
-                generation_config=self.generation_config
-            )
-            
-            # Prepare the content for the model based on whether we have conversation history
-            if conversation_history:
-                # Use conversation history to generate a contextual response
-                # Note: Gemini 1.5 doesn't support system role, so we use user message with instructions
-                instructions_message = {"role": "user", "parts": [{"text": f"Instructions for you: {self.system_instructions}"}]}
-                conversation_with_instructions = [instructions_message] + conversation_history
-                
-                response = await asyncio.to_thread(
-                    model.generate_content,
-                    conversation_with_instructions
+            # One request at a time per conversation, so turns are never interleaved
+            scope = self._scope(user_id, channel_id)
+            async with self._conversation_lock(scope):
+                turns, conversation_preview, (mood_lead, mood_suffix) = self._start_turn(
+                    prompt, user_id, channel_id, author_name
                 )
-            else:
-                # No conversation history, use structured messages
-                messages = [
-                    {"role": "user", "parts": [{"text": f"Instructions for you: {self.system_instructions}"}]},
-                    {"role": "user", "parts": [{"text": prompt}]}
-                ]
-                response = await asyncio.to_thread(
-                    model.generate_content,
-                    messages
-                )
-            
-            # Extract the text from the response
-            if hasattr(response, 'text'):
-                response_text = response.text
-            else:
-                # Handle different response formats based on API version
-                response_text = str(response.candidates[0].content.parts[0].text)
-            
-            # Apply mood styling if enabled
-            if ENABLE_MOOD_INDICATOR and (mood_prefix or mood_suffix or mood_emoji):
-                if mood_emoji:
-                    styled_response = f"{mood_emoji} {mood_prefix}{response_text}{mood_suffix}"
-                else:
-                    styled_response = f"{mood_prefix}{response_text}{mood_suffix}"
-            else:
-                styled_response = response_text
-            
-            # Store the assistant's response in conversation memory if enabled
-            if ENABLE_CONVERSATION_MEMORY:
-                if user_id:
-                    conversation_manager.add_assistant_message(user_id, response_text)
-                elif channel_id:
-                    conversation_manager.add_channel_assistant_message(channel_id, response_text)
+                response_text = "".join([chunk async for chunk in self._stream(turns, scope)])
+                self._finish_turn(user_id, channel_id, response_text)
             
             # Format the conversation preview for display
             formatted_preview = None
             if conversation_preview:
                 formatted_preview = conversation_manager.format_preview_for_discord(conversation_preview)
             
-            return styled_response, formatted_preview
+            # Most replies carry no mood decoration; return those untouched
+            if mood_lead or mood_suffix:
+                response_text = "".join((mood_lead, response_text, mood_suffix))
+            return response_text, formatted_preview
                 
         except Exception as e:
             logger.error(f"Error generating response from Gemini: {e}")
             raise Exception(f"Failed to generate AI response: {str(e)}")
     
+    async def stream_response(self, prompt: str, user_id: Optional[int] = None,
+                              channel_id: Optional[int] = None, author_name: str = "") -> AsyncIterator[str]:
+        """
+        Stream a response from Gemini 1.5 piece by piece as it is generated.
+        
+        Takes the same arguments as generate_response(). The pieces joined together
+        form the same styled response; the reply is added to conversation memory once
+        the stream completes.
+        
+        Yields:
+            Successive pieces of the response text.
+            
+        Raises:
+            Exception: If there's an error in generating the response.
+        """
+        try:
+            # One request at a time per conversation, so turns are never interleaved
+            scope = self._scope(user_id, channel_id)
+            async with self._conversation_lock(scope):
+                turns, _, (mood_lead, mood_suffix) = self._start_turn(prompt, user_id, channel_id, author_name)
+                if mood_lead:
+                    yield mood_lead
+                
+                parts = []
+                async for chunk in self._stream(turns, scope):
+                    parts.append(chunk)
+                    yield chunk
+                
+                if mood_suffix:
+                    yield mood_suffix
+                self._finish_turn(user_id, channel_id, "".join(parts))
+            
+        except Exception as e:
+            logger.error(f"Error streaming response from Gemini: {e}")
+            raise Exception(f"Failed to generate AI response: {str(e)}")
+    
+    @staticmethod
+    def _scope(user_id: Optional[int], channel_id: Optional[int]) -> Optional[Tuple[str, int]]:
+        """Get the (kind, id) of the conversation a request belongs to, or None without memory."""
+        if ENABLE_CONVERSATION_MEMORY:
+            if user_id:
+                return "user", user_id
+            if channel_id:
+                return "channel", channel_id
+        return None
+    
+    def _conversation_lock(self, scope: Optional[Tuple[str, int]]):
+        """Get the lock for a conversation (a no-op for requests outside conversation memory)."""
+        if scope is None:
+            return contextlib.nullcontext()
+        return conversation_manager.lock(*scope)
+    
+    def _start_turn(self, prompt: str, user_id: Optional[int], channel_id: Optional[int],
+                    author_name: str) -> Tuple[List[Dict], Optional[List[Message]], Tuple[str, str]]:
+        """
+        Record the prompt in conversation memory and gather what is needed to answer it.
+        
+        Returns:
+            A tuple of (conversation turns to send, conversation preview, (mood lead, mood suffix)).
+        """
+        conversation = None
+        conversation_preview = None
+        conversation_history = None
+        
+        # Handle conversation memory if enabled
+        if ENABLE_CONVERSATION_MEMORY:
+            if user_id:
+                # User-specific conversation
+                conversation = conversation_manager.get_user_conversation(user_id)
+                conversation_manager.add_user_message(user_id, prompt, author_name)
+                conversation_history = conversation.get_formatted_history(token_budget=self.history_token_budget)
+                conversation_preview = conversation_manager.get_user_conversation_preview(user_id)
+            elif channel_id:
+                # Channel-specific conversation
+                conversation = conversation_manager.get_channel_conversation(channel_id)
+                conversation_manager.add_channel_user_message(channel_id, user_id or 0, prompt, author_name)
+                conversation_history = conversation.get_formatted_history(token_budget=self.history_token_budget)
+                conversation_preview = conversation_manager.get_channel_conversation_preview(channel_id)
+        
+        # Get mood information if enabled
+        mood_lead = mood_suffix = ""
+        if conversation is not None and ENABLE_MOOD_INDICATOR:
+            conversation.maybe_change_mood()
+            mood_prefix, mood_suffix = conversation.get_mood_decorator()
+            mood_emoji = conversation.get_mood_emoji()
+            mood_lead = f"{mood_emoji} {mood_prefix}" if mood_emoji else mood_prefix
+        
+        turns = conversation_history or [{"role": "user", "parts": [{"text": prompt}]}]
+        return turns, conversation_preview, (mood_lead, mood_suffix)
+    
+    def _finish_turn(self, user_id: Optional[int], channel_id: Optional[int], response_text: str) -> None:
+        """Store the assistant's response in conversation memory if enabled."""
+        if ENABLE_CONVERSATION_MEMORY:
+            if user_id:
+                conversation_manager.add_assistant_message(user_id, response_text)
+            elif channel_id:
+                conversation_manager.add_channel_assistant_message(channel_id, response_text)
+    
+    async def _stream(self, turns: List[Dict], scope: Optional[Tuple[str, int]] = None) -> AsyncIterator[str]:
+        """
+        Yield the unstyled model response to the given conversation turns.
+        
+        A cache hit is yielded as a single piece.
+        
+        Args:
+            turns: The conversation turns to answer.
+            scope: The conversation the turns belong to, as returned by _scope().
+        """
+        # Same conversation, same previous turn and same prompt: reuse the earlier answer
+        exact_key = (
+            scope,
+            turns[-2]["parts"][0]["text"] if len(turns) > 1 else None,
+            turns[-1]["parts"][0]["text"]
+        )
+        cached = self._exact_cache.get(exact_key)
+        if cached is not None and time.monotonic() - cached[0] < CONVERSATION_MEMORY_EXPIRY:
+            self._exact_cache.move_to_end(exact_key)
+            yield cached[1]
+            return
+        
+        # Cap the number of requests in flight across all users
+        async with self._request_slots:
+            # Serve near-identical requests from the semantic cache
+            cache_key = cache_embedding = None
+            if self._semantic_cache is not None:
+                cache_key, cache_embedding, cached = await self._semantic_lookup(turns)
+                if cached is not None:
+                    self._remember(exact_key, cached)
+                    yield cached
+                    return
+            
+            first, chunks = await self._open_stream(turns)
+            parts = []
+            if first is not None:
+                parts.append(_extract_text(first))
+                yield parts[-1]
+            async for chunk in chunks:
+                parts.append(_extract_text(chunk))
+                yield parts[-1]
+        
+        response_text = "".join(parts)
+        self._remember(exact_key, response_text)
+        if cache_embedding is not None:
+            self._semantic_cache.store(cache_key, cache_embedding, response_text)
+    
+    def _remember(self, key: Tuple, response_text: str) -> None:
+        """Store an answer in the exact-match cache, evicting the least recently used one when full."""
+        self._exact_cache[key] = (time.monotonic(), response_text)
+        self._exact_cache.move_to_end(key)
+        if len(self._exact_cache) > EXACT_CACHE_SIZE:
+            self._exact_cache.popitem(last=False)
+    
+    async def _open_stream(self, turns: List[Dict], retries: int = GEMINI_MAX_RETRIES):
+        """
+        Start a streaming request, retrying transient API errors with jittered exponential backoff.
+        
+        Retrying is only safe until text has been handed out, so the first chunk is
+        fetched here as part of each attempt.
+        
+        Returns:
+            A tuple of (first chunk or None for an empty response, iterator over the rest).
+        """
+        for attempt in range(retries + 1):
+            try:
+                # The async client runs on the event loop and reuses its channel across requests
+                response = await self.model.generate_content_async(turns, stream=True)
+                chunks = aiter(response)
+                return await anext(chunks, None), chunks
+            except TRANSIENT_ERRORS as e:
+                if attempt == retries:
+                    raise
+                delay = min(2 ** attempt + random.random(), MAX_RETRY_DELAY)
+                logger.warning(f"Gemini request failed ({e}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+    
+    async def _semantic_lookup(self, turns: List[Dict]) -> Tuple[Optional[str], Optional[List[float]], Optional[str]]:
+        """
+        Look up a cached answer for the last few turns of a request.
+        
+        Args:
+            turns: The conversation turns about to be sent to Gemini.
+        
+        Returns:
+            A tuple of (cache_key, embedding, cached_response). The response is None on a
+            miss; the key and embedding are None if the lookup itself failed.
+        """
+        text = "\n".join(
+            f"{turn['role']}: {turn['parts'][0]['text']}" for turn in turns[-SEMANTIC_CACHE_TURNS:]
+        )
+        try:
+            embedding = await self._embedder.embed(text)
+            # The similarity scan is pure Python; keep it off the event loop
+            cached = await asyncio.to_thread(self._semantic_cache.lookup, embedding)
+        except Exception as e:
+            # The cache is best-effort; fall through to a normal request
+            logger.warning(f"Semantic cache lookup failed: {e}")
+            return None, None, None
+        
+        return hashlib.sha256(text.encode()).hexdigest(), embedding, cached
+    
     async def clear_conversation(self, user_id: Optional[int] = None, channel_id: Optional[int] = None) -> bool:
         """
         Clear conversation history for a user or channel.
@@ -201,3 +385,9 @@ class GeminiAIService:
             return conversation_manager.format_preview_for_discord(preview)
         
         return None
+
+
+@functools.lru_cache(maxsize=1)
+def get_ai_service() -> GeminiAIService:
+    """Return the process-wide Gemini AI service, creating it on first use."""
+    return GeminiAIService()
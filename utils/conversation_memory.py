@@ -3,69 +3,114 @@ Conversation memory management for the Discord bot.
 Handles storing, retrieving, and managing conversation history for users and channels.
 """
 import time
+import heapq
+import asyncio
 import logging
 import random
+import weakref
+import itertools
+import functools
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Tuple
+from typing import Deque, Dict, List, Optional, Tuple
 
 from config import (
     MAX_CONVERSATION_HISTORY,
     CONVERSATION_MEMORY_EXPIRY,
     CONVERSATION_PREVIEW_LENGTH,
-    MOODS,
+    MOOD_NAMES,
     DEFAULT_MOOD,
     MOOD_CHANGE_PROBABILITY,
-    ENABLE_MOOD_INDICATOR
+    ENABLE_MOOD_INDICATOR,
+    get_mood
 )
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Seconds between sweeps of the expiry heap
+REAP_INTERVAL = 60
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the number of tokens in a text (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+@functools.lru_cache(maxsize=None)
+def _frozen_mood(name: str) -> Tuple[Tuple[str, ...], Tuple[str, ...], str]:
+    """Get a mood's (prefixes, suffixes, emoji) as immutable tuples, built on first use."""
+    mood_info = get_mood(name)
+    return tuple(mood_info["prefixes"]), tuple(mood_info["suffixes"]), mood_info.get("emoji", "")
+
+
+@dataclass(slots=True)
 class Message:
     """Represents a single message in a conversation."""
     role: str  # 'user' or 'assistant'
     content: str
-    timestamp: float = field(default_factory=time.time)
     author_name: str = ""  # Name of the person who sent the message
-    author_id: int = 0  # Discord ID of the person
 
 
-@dataclass
+def _bounded_deque() -> deque:
+    """Deque that drops its oldest item once it holds MAX_CONVERSATION_HISTORY."""
+    return deque(maxlen=MAX_CONVERSATION_HISTORY)
+
+
+@dataclass(slots=True)
 class Conversation:
     """Represents a conversation with history."""
-    messages: List[Message] = field(default_factory=list)
-    last_activity: float = field(default_factory=time.time)
+    # Message history as parallel columns (oldest first) rather than one Message object each
+    roles: Deque[str] = field(default_factory=_bounded_deque)
+    contents: Deque[str] = field(default_factory=_bounded_deque)
+    author_names: Deque[str] = field(default_factory=_bounded_deque)
+    last_activity: float = field(default_factory=time.monotonic)  # Only compared against other monotonic times
     mood: str = DEFAULT_MOOD
+    # Gemini-formatted copy of the history, kept in step by add_message()
+    _formatted: Deque[Dict] = field(default_factory=_bounded_deque, init=False, repr=False)
+    # The current mood's (prefixes, suffixes, emoji), kept in step with mood
+    _mood_entry: Tuple[Tuple[str, ...], Tuple[str, ...], str] = field(init=False, repr=False)
+    # Per-conversation generator, so concurrent conversations don't share the module RNG's state
+    _rng: random.Random = field(default_factory=random.Random, init=False, repr=False)
+    
+    def __post_init__(self) -> None:
+        self._formatted.extend(
+            {"role": role, "parts": [{"text": content}]} for role, content in zip(self.roles, self.contents)
+        )
+        self._mood_entry = _frozen_mood(self.mood)
     
     def add_message(self, message: Message) -> None:
         """Add a message to the conversation history."""
-        self.messages.append(message)
-        self.last_activity = time.time()
-        
-        # Keep only the most recent messages up to MAX_CONVERSATION_HISTORY
-        if len(self.messages) > MAX_CONVERSATION_HISTORY:
-            self.messages = self.messages[-MAX_CONVERSATION_HISTORY:]
+        self.roles.append(message.role)
+        self.contents.append(message.content)
+        self.author_names.append(message.author_name)
+        self._formatted.append({"role": message.role, "parts": [{"text": message.content}]})
+        self.last_activity = time.monotonic()
     
-    def get_formatted_history(self, include_all: bool = False) -> List[Dict[str, str]]:
+    def get_formatted_history(self, include_all: bool = False, token_budget: Optional[int] = None) -> List[Dict[str, str]]:
         """
         Get the conversation history formatted for the Gemini API.
         
         Args:
             include_all: Whether to include all messages (True) or just the most recent ones (False)
+            token_budget: If given, drop the oldest messages until the rest fit in this many
+                (estimated) tokens; the newest message is always kept
         
         Returns:
             List of messages in the format expected by Gemini API
         """
-        if not self.messages:
-            return []
-        
-        # If not including all, only return the most recent messages
-        messages_to_include = self.messages if include_all else self.messages[-MAX_CONVERSATION_HISTORY:]
-        
-        return [
-            {"role": msg.role, "parts": [{"text": msg.content}]}
-            for msg in messages_to_include
-        ]
+        # The deques never hold more than MAX_CONVERSATION_HISTORY messages, so
+        # "all" and "most recent" are the same set
+        if token_budget is None:
+            return list(self._formatted)
+        
+        # Walk from the newest message back until the budget runs out
+        kept = 0
+        for content in reversed(self.contents):
+            token_budget -= estimate_tokens(content)
+            if token_budget < 0 and kept:
+                break
+            kept += 1
+        return list(itertools.islice(self._formatted, len(self._formatted) - kept, None))
     
     def get_preview(self, max_length: int = CONVERSATION_PREVIEW_LENGTH) -> List[Message]:
         """
@@ -77,12 +122,18 @@ class Conversation:
         Returns:
             List of the most recent messages
         """
-        # Return at most the specified number of messages
-        return self.messages[-min(max_length, len(self.messages)):]
+        # Materialize Message objects only for the messages being previewed
+        start = max(0, len(self.contents) - max_length)
+        return [
+            Message(role=role, content=content, author_name=author_name)
+            for role, content, author_name in itertools.islice(
+                zip(self.roles, self.contents, self.author_names), start, None
+            )
+        ]
     
     def is_expired(self) -> bool:
         """Check if the conversation has expired based on inactivity."""
-        return time.time() - self.last_activity > CONVERSATION_MEMORY_EXPIRY
+        return time.monotonic() - self.last_activity > CONVERSATION_MEMORY_EXPIRY
     
     def maybe_change_mood(self) -> str:
         """
@@ -95,9 +146,9 @@ class Conversation:
             return DEFAULT_MOOD
             
         # Randomly change mood based on probability
-        if random.random() < MOOD_CHANGE_PROBABILITY:
-            available_moods = list(MOODS.keys())
-            self.mood = random.choice(available_moods)
+        if self._rng.random() < MOOD_CHANGE_PROBABILITY:
+            self.mood = self._rng.choice(MOOD_NAMES)
+            self._mood_entry = _frozen_mood(self.mood)
             logger.debug(f"Mood changed to: {self.mood}")
         
         return self.mood
@@ -112,9 +163,12 @@ class Conversation:
         if not ENABLE_MOOD_INDICATOR:
             return "", ""
             
-        mood_info = MOODS.get(self.mood, MOODS[DEFAULT_MOOD])
-        prefix = random.choice(mood_info["prefixes"]) if mood_info["prefixes"] else ""
-        suffix = random.choice(mood_info["suffixes"]) if mood_info["suffixes"] else ""
+        # One draw picks both: r enumerates every (prefix, suffix) pair
+        prefixes, suffixes, _ = self._mood_entry
+        n_suffixes = len(suffixes) or 1
+        r = self._rng.randrange((len(prefixes) or 1) * n_suffixes)
+        prefix = prefixes[r // n_suffixes] if prefixes else ""
+        suffix = suffixes[r % n_suffixes] if suffixes else ""
         
         return prefix, suffix
     
@@ -123,7 +177,7 @@ class Conversation:
         if not ENABLE_MOOD_INDICATOR:
             return ""
             
-        return MOODS.get(self.mood, MOODS[DEFAULT_MOOD]).get("emoji", "")
+        return self._mood_entry[2]
 
 
 class ConversationManager:
@@ -137,9 +191,13 @@ class ConversationManager:
         # Channel conversations: {channel_id: Conversation}
         self.channel_conversations: Dict[int, Conversation] = {}
         
-        # Regular cleanup interval (every hour)
-        self.last_cleanup = time.time()
-        self.cleanup_interval = 3600  # 1 hour
+        # Min-heap of (expiry time, kind, id); entries go stale when a conversation
+        # sees new activity and are skipped when popped
+        self._expiry_heap: List[Tuple[float, str, int]] = []
+        self._reaper: Optional[asyncio.Task] = None
+        
+        # Per-conversation request locks, keyed by (kind, id); a lock disappears once nothing holds it
+        self._locks: "weakref.WeakValueDictionary[Tuple[str, int], asyncio.Lock]" = weakref.WeakValueDictionary()
         
         logger.info("Conversation manager initialized")
     
@@ -153,12 +211,10 @@ class ConversationManager:
         Returns:
             The user's conversation
         """
-        # Clean up expired conversations periodically
-        self._maybe_cleanup()
-        
         # Get or create a new conversation for this user
         if user_id not in self.user_conversations:
             self.user_conversations[user_id] = Conversation()
+            self._schedule_expiry("user", user_id, self.user_conversations[user_id])
         
         return self.user_conversations[user_id]
     
@@ -172,12 +228,10 @@ class ConversationManager:
         Returns:
             The channel's conversation
         """
-        # Clean up expired conversations periodically
-        self._maybe_cleanup()
-        
         # Get or create a new conversation for this channel
         if channel_id not in self.channel_conversations:
             self.channel_conversations[channel_id] = Conversation()
+            self._schedule_expiry("channel", channel_id, self.channel_conversations[channel_id])
         
         return self.channel_conversations[channel_id]
     
@@ -195,11 +249,11 @@ class ConversationManager:
         message = Message(
             role="user",
             content=content,
-            author_name=author_name,
-            author_id=user_id
+            author_name=author_name
         )
         
         conversation.add_message(message)
+        self._schedule_expiry("user", user_id, conversation)
     
     def add_assistant_message(self, user_id: int, content: str) -> None:
         """
@@ -214,11 +268,11 @@ class ConversationManager:
         message = Message(
             role="assistant",
             content=content,
-            author_name="Gemini",
-            author_id=0  # 0 for the bot itself
+            author_name="Gemini"
         )
         
         conversation.add_message(message)
+        self._schedule_expiry("user", user_id, conversation)
     
     def add_channel_user_message(self, channel_id: int, user_id: int, content: str, author_name: str = "") -> None:
         """
@@ -235,11 +289,11 @@ class ConversationManager:
         message = Message(
             role="user",
             content=content,
-            author_name=author_name,
-            author_id=user_id
+            author_name=author_name
         )
         
         conversation.add_message(message)
+        self._schedule_expiry("channel", channel_id, conversation)
     
     def add_channel_assistant_message(self, channel_id: int, content: str) -> None:
         """
@@ -254,11 +308,11 @@ class ConversationManager:
         message = Message(
             role="assistant",
             content=content,
-            author_name="Gemini",
-            author_id=0  # 0 for the bot itself
+            author_name="Gemini"
         )
         
         conversation.add_message(message)
+        self._schedule_expiry("channel", channel_id, conversation)
     
     def clear_user_conversation(self, user_id: int) -> bool:
         """
@@ -272,6 +326,7 @@ class ConversationManager:
         """
         if user_id in self.user_conversations:
             self.user_conversations[user_id] = Conversation()
+            self._schedule_expiry("user", user_id, self.user_conversations[user_id])
             return True
         return False
     
@@ -287,6 +342,7 @@ class ConversationManager:
         """
         if channel_id in self.channel_conversations:
             self.channel_conversations[channel_id] = Conversation()
+            self._schedule_expiry("channel", channel_id, self.channel_conversations[channel_id])
             return True
         return False
     
@@ -331,47 +387,77 @@ class ConversationManager:
         if not messages:
             return "*No recent conversation.*"
         
-        formatted = ["**Conversation Preview:**"]
-        
-        for msg in messages:
-            name = msg.author_name or ("You" if msg.role == "user" else "Gemini")
-            formatted.append(f"**{name}**: {msg.content[:100]}{'...' if len(msg.content) > 100 else ''}")
+        def lines():
+            yield "**Conversation Preview:**"
+            for msg in messages:
+                name = msg.author_name or ("You" if msg.role == "user" else "Gemini")
+                content = msg.content
+                yield f"**{name}**: {content if len(content) <= 100 else content[:100] + '...'}"
         
-        return "\n".join(formatted)
+        return "\n".join(lines())
     
-    def _maybe_cleanup(self) -> None:
-        """Periodically clean up expired conversations to free memory."""
-        current_time = time.time()
-        
-        # Only run cleanup at the specified interval
-        if current_time - self.last_cleanup < self.cleanup_interval:
-            return
-        
-        # Update cleanup timestamp
-        self.last_cleanup = current_time
-        
-        # Clean up user conversations
-        expired_user_ids = [
-            user_id for user_id, conversation in self.user_conversations.items()
-            if conversation.is_expired()
-        ]
-        
-        for user_id in expired_user_ids:
-            del self.user_conversations[user_id]
-        
-        # Clean up channel conversations
-        expired_channel_ids = [
-            channel_id for channel_id, conversation in self.channel_conversations.items()
-            if conversation.is_expired()
-        ]
+    def lock(self, kind: str, key: int) -> asyncio.Lock:
+        """
+        Get the lock that serializes requests for a conversation.
         
-        for channel_id in expired_channel_ids:
-            del self.channel_conversations[channel_id]
+        Args:
+            kind: "user" or "channel"
+            key: Discord user or channel ID
+            
+        Returns:
+            An asyncio.Lock shared by every request for that conversation
+        """
+        lock = self._locks.get((kind, key))
+        if lock is None:
+            lock = self._locks[(kind, key)] = asyncio.Lock()
+        return lock
+    
+    def _schedule_expiry(self, kind: str, key: int, conversation: Conversation) -> None:
+        """
+        Record when a conversation will expire if it sees no further activity.
         
-        if expired_user_ids or expired_channel_ids:
+        Args:
+            kind: "user" or "channel"
+            key: Discord user or channel ID
+            conversation: The conversation that was just created or updated
+        """
+        heapq.heappush(self._expiry_heap, (conversation.last_activity + CONVERSATION_MEMORY_EXPIRY, kind, key))
+        
+        # Start sweeping once there is an event loop to run on
+        if self._reaper is None or self._reaper.done():
+            try:
+                self._reaper = asyncio.get_running_loop().create_task(self._reap_periodically())
+            except RuntimeError:
+                pass
+    
+    async def _reap_periodically(self) -> None:
+        """Remove expired conversations every REAP_INTERVAL seconds."""
+        while True:
+            await asyncio.sleep(REAP_INTERVAL)
+            self._reap_expired()
+    
+    def _reap_expired(self) -> None:
+        """Pop every due heap entry and drop its conversation if it really has expired."""
+        now = time.monotonic()
+        expired_users = expired_channels = 0
+        
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            _, kind, key = heapq.heappop(self._expiry_heap)
+            conversations = self.user_conversations if kind == "user" else self.channel_conversations
+            conversation = conversations.get(key)
+            # Skip stale entries: the conversation was removed or has been active since
+            if conversation is None or conversation.last_activity + CONVERSATION_MEMORY_EXPIRY > now:
+                continue
+            del conversations[key]
+            if kind == "user":
+                expired_users += 1
+            else:
+                expired_channels += 1
+        
+        if expired_users or expired_channels:
             logger.info(
-                f"Cleaned up {len(expired_user_ids)} expired user conversations and "
-                f"{len(expired_channel_ids)} expired channel conversations"
+                f"Cleaned up {expired_users} expired user conversations and "
+                f"{expired_channels} expired channel conversations"
             )
 
 
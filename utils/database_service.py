@@ -5,77 +5,167 @@ Handles database operations for conversation memory.
 
 import logging
 import os
+import time
+import itertools
+import functools
 from typing import Dict, List, Optional, Tuple, Any
-from datetime import datetime
+import contextvars
+from collections import OrderedDict, deque
 from contextlib import contextmanager
-from flask import Flask
-from sqlalchemy.orm import scoped_session, sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy.orm import undefer
+from sqlalchemy import create_engine, delete, lambda_stmt, select
+from sqlalchemy.exc import DBAPIError, OperationalError
 
 # Configure logger first
 logger = logging.getLogger(__name__)
 
-# Check if we're running in the Flask app context
-try:
-    # First try importing from app to see if we're in Flask context
+# models.py decides whether we're running in the Flask app context (USE_WEB=1)
+from models import USING_FLASK_APP, User, UserSettings, Channel, Conversation, Message, strict_load, bulk_add_messages, upsert_user, load_context, load_turns, trim_history, touch_conversation
+if USING_FLASK_APP:
     from app import db
-    from models import USING_FLASK_APP, User, UserSettings, Channel, Conversation, Message
     logger.info("Using Flask application context for database operations")
-except (ImportError, RuntimeError):
-    # If not using Flask app context, models.py will define USING_FLASK_APP as False
+else:
     # This is the case when running in standalone mode (clean_bot.py)
-    from models import USING_FLASK_APP, User, UserSettings, Channel, Conversation, Message
     from models import Base, engine, SessionLocal
     logger.info("Using standalone SQLAlchemy for database operations (no Flask app context)")
 
-# Use the SessionLocal from models.py if not using Flask
-if not USING_FLASK_APP:
-    # Create a scoped session from SessionLocal
-    Session = scoped_session(SessionLocal)
-    logger.info("Created scoped database session for standalone mode")
-else:
-    Session = None
-    logger.info("Using Flask-SQLAlchemy session")
+# Messages kept per conversation, and how often (in messages stored to that conversation) to enforce it
+MAX_STORED_MESSAGES = 50
+TRIM_INTERVAL = 10
+# Most recent messages loaded as context for the model
+MAX_HISTORY_MESSAGES = 20
+
+# Discord ID -> conversation primary key mappings kept in memory
+CONVERSATION_PK_CACHE_SIZE = 10_000
+# Discord user ID -> (user primary key, username) mappings kept in memory
+USER_PK_CACHE_SIZE = 10_000
+# Conversations whose formatted history is kept in memory
+HISTORY_CACHE_SIZE = 1_000
+
+# The session of the innermost active session_scope() in this thread / asyncio task
+_current_session: contextvars.ContextVar = contextvars.ContextVar("db_session", default=None)
 
 @contextmanager
 def session_scope():
-    """Provide a transactional scope around a series of operations."""
+    """
+    Provide a transactional scope around a series of operations.
+    
+    Scopes nest: an inner session_scope() (e.g. get_or_create_channel() called from
+    get_channel_conversation()) reuses the outer scope's session, and only the outermost
+    scope commits and closes it. The current session is tracked in a context
+    variable, so each thread and asyncio task gets its own.
+    
+    Callables appended to ``session.info["on_rollback"]`` run if the transaction is
+    rolled back, e.g. to forget cached primary keys of rows that were never committed.
+    """
+    session = _current_session.get()
+    if session is not None:
+        yield session
+        return
+    
     if USING_FLASK_APP:
-        try:
-            # Use Flask-SQLAlchemy session
-            yield db.session
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            logger.error(f"Database error: {e}")
-            raise
-        finally:
-            db.session.close()
+        # Use Flask-SQLAlchemy session
+        session = db.session
     else:
         # Use standalone SQLAlchemy session
-        if Session is None:
-            logger.error("Database session is not available")
-            raise RuntimeError("Database connection is not available")
-            
-        session = Session()
-        try:
-            yield session
-            session.commit()
-        except Exception as e:
-            session.rollback()
-            logger.error(f"Database error: {e}")
-            raise
-        finally:
+        session = SessionLocal()
+    
+    token = _current_session.set(session)
+    try:
+        yield session
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        for forget in session.info.pop("on_rollback", ()):
+            forget()
+        logger.error(f"Database error: {e}")
+        raise
+    finally:
+        session.info.pop("on_rollback", None)
+        _current_session.reset(token)
+        # commit()/rollback() already returned the connection to the pool. Flask-SQLAlchemy's
+        # scoped session is removed by its app-context teardown, so only close our own sessions.
+        if not USING_FLASK_APP:
             session.close()
 
 
+# SQLSTATEs worth retrying: serialization failure and deadlock
+TRANSIENT_SQLSTATES = {"40001", "40P01"}
+
+
+def _is_transient(exc: Exception) -> bool:
+    """Whether a database error is likely to succeed when the transaction is retried."""
+    if not isinstance(exc, DBAPIError):
+        return False
+    if exc.connection_invalidated:
+        return True
+    if not isinstance(exc, OperationalError):
+        return False
+    sqlstate = getattr(exc.orig, "pgcode", None) or getattr(exc.orig, "sqlstate", None)
+    return sqlstate in TRANSIENT_SQLSTATES or "database is locked" in str(exc.orig)
+
+
+def retry_on_transient(max_attempts: int = 3, base_delay: float = 0.05):
+    """
+    Retry a transactional method on dropped connections, deadlocks and lock timeouts.
+    
+    Waits ``base_delay * 2**attempt`` seconds between attempts. Only the outermost
+    call retries: a method called inside another's session_scope() re-raises so the
+    whole transaction is retried from the top.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_session.get() is not None:
+                return func(*args, **kwargs)
+            for attempt in range(max_attempts):
+                try:
+                    return func(*args, **kwargs)
+                except DBAPIError as e:
+                    if attempt == max_attempts - 1 or not _is_transient(e):
+                        raise
+                    delay = base_delay * 2 ** attempt
+                    logger.warning(f"Transient database error in {func.__name__}, retrying in {delay:.2f}s: {e}")
+                    time.sleep(delay)
+        return wrapper
+    return decorator
+
+
 class DatabaseConversationService:
     """Service for storing and retrieving conversation data from the database."""
     
     def __init__(self):
         """Initialize the database conversation service."""
+        # Conversation ID -> messages stored since its last trim in this process
+        self._untrimmed: Dict[int, int] = {}
+        # ("user" | "channel", Discord ID) -> conversation primary key, least recently used first.
+        # Only integer keys are cached; ORM objects never outlive their session.
+        self._conversation_pks: "OrderedDict[Tuple[str, int], int]" = OrderedDict()
+        # Discord user ID -> (user primary key, last stored username), least recently used first
+        self._user_pks: "OrderedDict[int, Tuple[int, str]]" = OrderedDict()
+        # Discord user ID -> personality, only for users in _user_pks (evicted together)
+        self._personalities: Dict[int, Optional[str]] = {}
+        # Conversation ID -> its newest MAX_STORED_MESSAGES messages, Gemini-formatted.
+        # This process is the only writer, so the cache is kept in step with every insert.
+        self._history: "OrderedDict[int, deque]" = OrderedDict()
         logger.info("Database conversation service initialized")
+    
+    def _maybe_trim(self, session, conversation_id: int, added: int) -> None:
+        """
+        Trim a conversation to MAX_STORED_MESSAGES once TRIM_INTERVAL messages were
+        stored in it since its last trim (and on its first write in this process).
+        
+        Each conversation keeps its own count, so stored history runs at most
+        TRIM_INTERVAL - 1 messages over the limit; that's fine for a size cap and
+        saves a DELETE on most messages.
+        """
+        untrimmed = self._untrimmed.get(conversation_id, TRIM_INTERVAL) + added
+        if untrimmed >= TRIM_INTERVAL:
+            trim_history(session, conversation_id, keep=MAX_STORED_MESSAGES)
+            untrimmed = 0
+        self._untrimmed[conversation_id] = untrimmed
         
+    @retry_on_transient()
     def get_or_create_user(self, discord_id: int, username: str) -> User:
         """
         Get or create a user by Discord ID.
@@ -88,18 +178,10 @@ class DatabaseConversationService:
             User object
         """
         with session_scope() as session:
-            user = session.query(User).filter_by(discord_id=discord_id).first()
-            if not user:
-                user = User(discord_id=discord_id, username=username)
-                session.add(user)
-                session.flush()  # Flush to get the ID
-                
-                # Create default settings
-                settings = UserSettings(user_id=user.id, personality="balanced")
-                session.add(settings)
-                
-            return user
+            # Single upsert; also creates the default settings for new users
+            return upsert_user(session, discord_id, username)
     
+    @retry_on_transient()
     def get_or_create_channel(self, discord_id: int, name: Optional[str] = None) -> Channel:
         """
         Get or create a channel by Discord ID.
@@ -120,66 +202,56 @@ class DatabaseConversationService:
                 
             return channel
     
-    def get_user_conversation(self, discord_user_id: int, username: str) -> Tuple[Conversation, List[Dict[str, Any]]]:
+    @retry_on_transient()
+    def get_user_conversation(self, discord_user_id: int, username: str,
+                              max_history: int = MAX_HISTORY_MESSAGES) -> Tuple[Conversation, List[Dict[str, Any]]]:
         """
         Get or create a conversation for a user.
         
         Args:
             discord_user_id: Discord user ID
             username: Discord username
+            max_history: Number of most recent messages to return
             
         Returns:
             Tuple of (Conversation object, formatted message history)
         """
         with session_scope() as session:
             # Get or create user
-            user = self.get_or_create_user(discord_user_id, username)
+            user_id = self._user_id(session, discord_user_id, username)
             
             # Get or create conversation
-            conversation = session.query(Conversation).filter_by(user_id=user.id).first()
-            if not conversation:
-                conversation = Conversation(user_id=user.id, mood="thoughtful", energy_level=3)
-                session.add(conversation)
-                session.flush()
+            conversation = self._user_conversation(session, user_id, discord_user_id)
             
             # Get message history
-            messages = session.query(Message).filter_by(conversation_id=conversation.id).order_by(Message.created_at).all()
-            
-            # Format for API
-            formatted_messages = [{"role": msg.role, "parts": [{"text": msg.content}]} for msg in messages]
+            formatted_messages = self._formatted_history(session, conversation.id, max_history)
             
             return conversation, formatted_messages
     
-    def get_channel_conversation(self, discord_channel_id: int, channel_name: Optional[str] = None) -> Tuple[Conversation, List[Dict[str, Any]]]:
+    @retry_on_transient()
+    def get_channel_conversation(self, discord_channel_id: int, channel_name: Optional[str] = None,
+                                 max_history: int = MAX_HISTORY_MESSAGES) -> Tuple[Conversation, List[Dict[str, Any]]]:
         """
         Get or create a conversation for a channel.
         
         Args:
             discord_channel_id: Discord channel ID
             channel_name: Channel name (optional)
+            max_history: Number of most recent messages to return
             
         Returns:
             Tuple of (Conversation object, formatted message history)
         """
         with session_scope() as session:
-            # Get or create channel
-            channel = self.get_or_create_channel(discord_channel_id, channel_name)
-            
-            # Get or create conversation
-            conversation = session.query(Conversation).filter_by(channel_id=channel.id).first()
-            if not conversation:
-                conversation = Conversation(channel_id=channel.id, mood="thoughtful", energy_level=3)
-                session.add(conversation)
-                session.flush()
+            # Get or create channel and conversation
+            conversation = self._channel_conversation(session, discord_channel_id, channel_name)
             
             # Get message history
-            messages = session.query(Message).filter_by(conversation_id=conversation.id).order_by(Message.created_at).all()
-            
-            # Format for API
-            formatted_messages = [{"role": msg.role, "parts": [{"text": msg.content}]} for msg in messages]
+            formatted_messages = self._formatted_history(session, conversation.id, max_history)
             
             return conversation, formatted_messages
     
+    @retry_on_transient()
     def add_user_message(self, discord_user_id: int, content: str, author_name: str = "") -> Conversation:
         """
         Add a user message to their conversation history.
@@ -194,38 +266,26 @@ class DatabaseConversationService:
         """
         with session_scope() as session:
             # Get or create user and conversation
-            user = self.get_or_create_user(discord_user_id, author_name)
+            user_id = self._user_id(session, discord_user_id, author_name)
             
             # Get or create conversation
-            conversation = session.query(Conversation).filter_by(user_id=user.id).first()
-            if not conversation:
-                conversation = Conversation(user_id=user.id, mood="thoughtful", energy_level=3)
-                session.add(conversation)
-                session.flush()
-            
-            # Create message
-            message = Message(
-                conversation_id=conversation.id,
-                user_id=user.id,
-                role="user",
-                content=content,
-                author_name=author_name
-            )
-            session.add(message)
+            conversation = self._user_conversation(session, user_id, discord_user_id)
             
-            # Update conversation timestamp
-            conversation.updated_at = datetime.utcnow()
+            # Create message (Core insert; no ORM object or flush needed)
+            self._insert_messages(session, [{
+                "conversation_id": conversation.id,
+                "user_id": user_id,
+                "role": "user",
+                "content": content,
+                "author_name": author_name
+            }])
             
-            # Keep only the most recent messages (limit to 50)
-            # This is a hard limit to avoid excessive database size
-            messages = session.query(Message).filter_by(conversation_id=conversation.id).order_by(Message.created_at).all()
-            if len(messages) > 50:
-                # Delete older messages
-                for old_msg in messages[:-50]:
-                    session.delete(old_msg)
+            # Update conversation timestamp
+            touch_conversation(session, conversation.id)
             
             return conversation
     
+    @retry_on_transient()
     def add_assistant_message(self, discord_user_id: int, content: str) -> Conversation:
         """
         Add an assistant message to a user's conversation history.
@@ -238,32 +298,26 @@ class DatabaseConversationService:
             Updated conversation
         """
         with session_scope() as session:
-            # Get user
-            user = session.query(User).filter_by(discord_id=discord_user_id).first()
-            if not user:
-                logger.error(f"User with Discord ID {discord_user_id} not found")
-                return None
-            
             # Get conversation
-            conversation = session.query(Conversation).filter_by(user_id=user.id).first()
+            conversation = self._get_conversation(session, discord_user_id=discord_user_id)
             if not conversation:
                 logger.error(f"Conversation for user {discord_user_id} not found")
                 return None
             
-            # Create message
-            message = Message(
-                conversation_id=conversation.id,
-                role="assistant",
-                content=content,
-                author_name="Gemini"
-            )
-            session.add(message)
+            # Create message (Core insert; no ORM object or flush needed)
+            self._insert_messages(session, [{
+                "conversation_id": conversation.id,
+                "role": "assistant",
+                "content": content,
+                "author_name": "Gemini"
+            }])
             
             # Update conversation timestamp
-            conversation.updated_at = datetime.utcnow()
+            touch_conversation(session, conversation.id)
             
             return conversation
     
+    @retry_on_transient()
     def add_channel_user_message(self, discord_channel_id: int, discord_user_id: int, 
                                  content: str, author_name: str = "") -> Conversation:
         """
@@ -279,39 +333,25 @@ class DatabaseConversationService:
             Updated conversation
         """
         with session_scope() as session:
-            # Get or create channel and user
-            channel = self.get_or_create_channel(discord_channel_id)
-            user = self.get_or_create_user(discord_user_id, author_name)
-            
-            # Get or create conversation
-            conversation = session.query(Conversation).filter_by(channel_id=channel.id).first()
-            if not conversation:
-                conversation = Conversation(channel_id=channel.id, mood="thoughtful", energy_level=3)
-                session.add(conversation)
-                session.flush()
-            
-            # Create message
-            message = Message(
-                conversation_id=conversation.id,
-                user_id=user.id,
-                role="user",
-                content=content,
-                author_name=author_name
-            )
-            session.add(message)
+            # Get or create user, channel and conversation
+            user_id = self._user_id(session, discord_user_id, author_name)
+            conversation = self._channel_conversation(session, discord_channel_id)
+            
+            # Create message (Core insert; no ORM object or flush needed)
+            self._insert_messages(session, [{
+                "conversation_id": conversation.id,
+                "user_id": user_id,
+                "role": "user",
+                "content": content,
+                "author_name": author_name
+            }])
             
             # Update conversation timestamp
-            conversation.updated_at = datetime.utcnow()
-            
-            # Keep only the most recent messages (limit to 50)
-            messages = session.query(Message).filter_by(conversation_id=conversation.id).order_by(Message.created_at).all()
-            if len(messages) > 50:
-                # Delete older messages
-                for old_msg in messages[:-50]:
-                    session.delete(old_msg)
+            touch_conversation(session, conversation.id)
             
             return conversation
     
+    @retry_on_transient()
     def add_channel_assistant_message(self, discord_channel_id: int, content: str) -> Conversation:
         """
         Add an assistant message to a channel's conversation history.
@@ -324,58 +364,115 @@ class DatabaseConversationService:
             Updated conversation
         """
         with session_scope() as session:
-            # Get channel
-            channel = session.query(Channel).filter_by(discord_id=discord_channel_id).first()
-            if not channel:
-                logger.error(f"Channel with Discord ID {discord_channel_id} not found")
-                return None
-            
             # Get conversation
-            conversation = session.query(Conversation).filter_by(channel_id=channel.id).first()
+            conversation = self._get_conversation(session, discord_channel_id=discord_channel_id)
             if not conversation:
                 logger.error(f"Conversation for channel {discord_channel_id} not found")
                 return None
             
-            # Create message
-            message = Message(
-                conversation_id=conversation.id,
-                role="assistant",
-                content=content,
-                author_name="Gemini"
-            )
-            session.add(message)
+            # Create message (Core insert; no ORM object or flush needed)
+            self._insert_messages(session, [{
+                "conversation_id": conversation.id,
+                "role": "assistant",
+                "content": content,
+                "author_name": "Gemini"
+            }])
             
             # Update conversation timestamp
-            conversation.updated_at = datetime.utcnow()
+            touch_conversation(session, conversation.id)
             
             return conversation
     
-    def clear_user_conversation(self, discord_user_id: int) -> bool:
+    @retry_on_transient()
+    def add_exchange(self, discord_user_id: int, user_content: str, assistant_content: str,
+                     author_name: str = "") -> Conversation:
         """
-        Clear a user's conversation history.
+        Add a user message and the assistant's reply to a user's conversation history
+        in one transaction.
         
         Args:
             discord_user_id: Discord user ID
+            user_content: The user's message
+            assistant_content: The assistant's reply
+            author_name: Name of the user
             
         Returns:
-            True if successful, False otherwise
+            Updated conversation
         """
         with session_scope() as session:
-            # Get user
-            user = session.query(User).filter_by(discord_id=discord_user_id).first()
-            if not user:
-                return False
+            # Get or create user and conversation
+            user_id = self._user_id(session, discord_user_id, author_name)
+            conversation = self._user_conversation(session, user_id, discord_user_id)
             
-            # Get conversation
-            conversation = session.query(Conversation).filter_by(user_id=user.id).first()
-            if not conversation:
-                return False
+            self._store_exchange(session, conversation, user_id, user_content, assistant_content, author_name)
+            return conversation
+    
+    @retry_on_transient()
+    def add_channel_exchange(self, discord_channel_id: int, discord_user_id: int, user_content: str,
+                             assistant_content: str, author_name: str = "") -> Conversation:
+        """
+        Add a user message and the assistant's reply to a channel's conversation history
+        in one transaction.
+        
+        Args:
+            discord_channel_id: Discord channel ID
+            discord_user_id: Discord user ID
+            user_content: The user's message
+            assistant_content: The assistant's reply
+            author_name: Name of the user
             
-            # Delete all messages
-            session.query(Message).filter_by(conversation_id=conversation.id).delete()
+        Returns:
+            Updated conversation
+        """
+        with session_scope() as session:
+            # Get or create user, channel and conversation
+            user_id = self._user_id(session, discord_user_id, author_name)
+            conversation = self._channel_conversation(session, discord_channel_id)
             
-            return True
+            self._store_exchange(session, conversation, user_id, user_content, assistant_content, author_name)
+            return conversation
+    
+    def _store_exchange(self, session, conversation: Conversation, user_id: int,
+                        user_content: str, assistant_content: str, author_name: str) -> None:
+        """Insert a user message and its reply with one executemany, then touch the conversation once."""
+        self._insert_messages(session, [
+            {
+                "conversation_id": conversation.id,
+                "user_id": user_id,
+                "role": "user",
+                "content": user_content,
+                "author_name": author_name
+            },
+            {
+                "conversation_id": conversation.id,
+                "user_id": None,
+                "role": "assistant",
+                "content": assistant_content,
+                "author_name": "Gemini"
+            },
+        ])
+        
+        # Update conversation timestamp
+        touch_conversation(session, conversation.id)
     
+    @retry_on_transient()
+    def clear_user_conversation(self, discord_user_id: int) -> bool:
+        """
+        Clear a user's conversation history.
+        
+        Args:
+            discord_user_id: Discord user ID
+            
+        Returns:
+            True if any messages were deleted, False otherwise
+        """
+        with session_scope() as session:
+            conversation_ids = (select(Conversation.id)
+                                .join(User, Conversation.user_id == User.id)
+                                .where(User.discord_id == discord_user_id))
+            return self._clear_messages(session, ("user", discord_user_id), conversation_ids)
+    
+    @retry_on_transient()
     def clear_channel_conversation(self, discord_channel_id: int) -> bool:
         """
         Clear a channel's conversation history.
@@ -384,24 +481,15 @@ class DatabaseConversationService:
             discord_channel_id: Discord channel ID
             
         Returns:
-            True if successful, False otherwise
+            True if any messages were deleted, False otherwise
         """
         with session_scope() as session:
-            # Get channel
-            channel = session.query(Channel).filter_by(discord_id=discord_channel_id).first()
-            if not channel:
-                return False
-            
-            # Get conversation
-            conversation = session.query(Conversation).filter_by(channel_id=channel.id).first()
-            if not conversation:
-                return False
-            
-            # Delete all messages
-            session.query(Message).filter_by(conversation_id=conversation.id).delete()
-            
-            return True
+            conversation_ids = (select(Conversation.id)
+                                .join(Channel, Conversation.channel_id == Channel.id)
+                                .where(Channel.discord_id == discord_channel_id))
+            return self._clear_messages(session, ("channel", discord_channel_id), conversation_ids)
     
+    @retry_on_transient()
     def set_user_personality(self, discord_user_id: int, personality: str) -> bool:
         """
         Set a user's personality preference.
@@ -415,20 +503,22 @@ class DatabaseConversationService:
         """
         with session_scope() as session:
             # Get user
-            user = session.query(User).filter_by(discord_id=discord_user_id).first()
+            user = self._find_user(session, discord_user_id)
             if not user:
                 return False
             
-            # Get or create settings
-            settings = session.query(UserSettings).filter_by(user_id=user.id).first()
+            # Get or create settings (joined-loaded with the user)
+            settings = user.settings
             if not settings:
                 settings = UserSettings(user_id=user.id, personality=personality)
                 session.add(settings)
             else:
                 settings.personality = personality
+            self._remember_personality(session, discord_user_id, personality)
             
             return True
             
+    @retry_on_transient()
     def update_user_settings(self, discord_user_id: int, **settings) -> bool:
         """
         Update a user's settings with the provided values.
@@ -442,12 +532,12 @@ class DatabaseConversationService:
         """
         with session_scope() as session:
             # Get user
-            user = session.query(User).filter_by(discord_id=discord_user_id).first()
+            user = self._find_user(session, discord_user_id)
             if not user:
                 return False
             
-            # Get or create settings
-            user_settings = session.query(UserSettings).filter_by(user_id=user.id).first()
+            # Get or create settings (joined-loaded with the user)
+            user_settings = user.settings
             if not user_settings:
                 # Create with defaults plus provided settings
                 kwargs = {k: v for k, v in settings.items() if hasattr(UserSettings, k)}
@@ -458,9 +548,12 @@ class DatabaseConversationService:
                 for key, value in settings.items():
                     if hasattr(user_settings, key):
                         setattr(user_settings, key, value)
+            if "personality" in settings:
+                self._remember_personality(session, discord_user_id, user_settings.personality)
             
             return True
             
+    @retry_on_transient()
     def get_user_settings(self, discord_user_id: int) -> Optional[Dict[str, Any]]:
         """
         Get a user's settings.
@@ -472,13 +565,11 @@ class DatabaseConversationService:
             Dictionary of user settings or None if user not found
         """
         with session_scope() as session:
-            # Get user
-            user = session.query(User).filter_by(discord_id=discord_user_id).first()
-            if not user:
-                return None
-            
-            # Get settings
-            settings = session.query(UserSettings).filter_by(user_id=user.id).first()
+            # Get settings straight through the user join; no User row is loaded
+            settings = (session.query(UserSettings)
+                        .join(User, UserSettings.user_id == User.id)
+                        .filter(User.discord_id == discord_user_id)
+                        .first())
             if not settings:
                 return None
             
@@ -492,6 +583,7 @@ class DatabaseConversationService:
                 "dm_conversation_preview": settings.dm_conversation_preview
             }
     
+    @retry_on_transient()
     def get_user_personality(self, discord_user_id: int) -> Optional[str]:
         """
         Get a user's personality preference.
@@ -502,19 +594,20 @@ class DatabaseConversationService:
         Returns:
             Personality name or None if not found
         """
+        if discord_user_id in self._personalities:
+            return self._personalities[discord_user_id]
+        
         with session_scope() as session:
-            # Get user
-            user = session.query(User).filter_by(discord_id=discord_user_id).first()
-            if not user:
-                return None
-            
-            # Get settings
-            settings = session.query(UserSettings).filter_by(user_id=user.id).first()
-            if not settings:
-                return None
-            
-            return settings.personality
+            # One joined scalar query; a missing user or settings row both yield None
+            personality = session.scalar(lambda_stmt(
+                lambda: select(UserSettings.personality)
+                .join(User, UserSettings.user_id == User.id)
+                .where(User.discord_id == discord_user_id)
+            ))
+            self._remember_personality(session, discord_user_id, personality)
+            return personality
     
+    @retry_on_transient()
     def get_conversation_preview(self, discord_user_id: int = None, discord_channel_id: int = None, 
                                 max_messages: int = 5) -> List[Dict[str, Any]]:
         """
@@ -529,37 +622,12 @@ class DatabaseConversationService:
             List of messages with role, content, author_name
         """
         with session_scope() as session:
-            if discord_user_id:
-                # Get user conversation
-                user = session.query(User).filter_by(discord_id=discord_user_id).first()
-                if not user:
-                    return []
-                
-                conversation = session.query(Conversation).filter_by(user_id=user.id).first()
-                if not conversation:
-                    return []
-                
-            elif discord_channel_id:
-                # Get channel conversation
-                channel = session.query(Channel).filter_by(discord_id=discord_channel_id).first()
-                if not channel:
-                    return []
-                
-                conversation = session.query(Conversation).filter_by(channel_id=channel.id).first()
-                if not conversation:
-                    return []
-            else:
+            conversation = self._get_conversation(session, discord_user_id, discord_channel_id)
+            if not conversation:
                 return []
             
-            # Get the most recent messages
-            messages = (session.query(Message)
-                       .filter_by(conversation_id=conversation.id)
-                       .order_by(Message.created_at.desc())
-                       .limit(max_messages)
-                       .all())
-            
-            # Reverse to get chronological order
-            messages.reverse()
+            # Get the most recent messages in chronological order
+            messages = load_context(session, conversation.id, limit=max_messages)
             
             # Format for display
             return [
@@ -571,6 +639,7 @@ class DatabaseConversationService:
                 for msg in messages
             ]
             
+    @retry_on_transient()
     def set_conversation_title(self, discord_user_id: int = None, discord_channel_id: int = None, 
                               title: str = None) -> bool:
         """
@@ -592,6 +661,7 @@ class DatabaseConversationService:
             conversation.title = title
             return True
             
+    @retry_on_transient()
     def add_conversation_tags(self, discord_user_id: int = None, discord_channel_id: int = None,
                              tags: List[str] = None) -> bool:
         """
@@ -613,15 +683,14 @@ class DatabaseConversationService:
             if not conversation:
                 return False
                 
-            # Add new tags to existing ones
-            existing_tags = set(conversation.tags.split(',')) if conversation.tags else set()
-            existing_tags.update(tags)
-            # Remove empty strings
-            existing_tags.discard('')
+            # Add new tags to existing ones, keeping their original order
+            existing_tags = list(conversation.tags or [])
+            existing_tags.extend(tag for tag in dict.fromkeys(tags) if tag and tag not in existing_tags)
             
-            conversation.tags = ','.join(existing_tags)
+            conversation.tags = existing_tags
             return True
             
+    @retry_on_transient()
     def remove_conversation_tags(self, discord_user_id: int = None, discord_channel_id: int = None,
                                tags: List[str] = None) -> bool:
         """
@@ -644,13 +713,11 @@ class DatabaseConversationService:
                 return False
                 
             # Remove specified tags
-            existing_tags = set(conversation.tags.split(','))
-            for tag in tags:
-                existing_tags.discard(tag)
-                
-            conversation.tags = ','.join(existing_tags) if existing_tags else None
+            removed = set(tags)
+            conversation.tags = [tag for tag in conversation.tags if tag not in removed]
             return True
             
+    @retry_on_transient()
     def archive_conversation(self, discord_user_id: int = None, discord_channel_id: int = None,
                             archive: bool = True) -> bool:
         """
@@ -672,6 +739,7 @@ class DatabaseConversationService:
             conversation.is_archived = archive
             return True
             
+    @retry_on_transient()
     def get_user_conversations(self, discord_user_id: int, include_archived: bool = False) -> List[Dict[str, Any]]:
         """
         Get all conversations for a user.
@@ -684,28 +752,30 @@ class DatabaseConversationService:
             List of conversation summaries
         """
         with session_scope() as session:
-            # Get user
-            user = session.query(User).filter_by(discord_id=discord_user_id).first()
-            if not user:
+            # Get user ID
+            user_id = session.query(User.id).filter_by(discord_id=discord_user_id).scalar()
+            if user_id is None:
                 return []
                 
             # Get conversations
-            query = session.query(Conversation).filter_by(user_id=user.id)
+            query = session.query(Conversation).filter_by(user_id=user_id)
             if not include_archived:
                 query = query.filter_by(is_archived=False)
                 
-            conversations = query.order_by(Conversation.updated_at.desc()).all()
+            # Count messages in the same SELECT instead of loading them
+            conversations = (strict_load(query, undefer(Conversation.message_count))
+                             .order_by(Conversation.updated_at.desc()).all())
             
             # Format for display
             return [
                 {
                     "id": conv.id,
                     "title": conv.title or f"Conversation {conv.id}",
-                    "tags": conv.tags.split(',') if conv.tags else [],
+                    "tags": list(conv.tags or []),
                     "mood": conv.mood,
                     "energy_level": conv.energy_level,
                     "is_archived": conv.is_archived,
-                    "message_count": len(conv.messages),
+                    "message_count": conv.message_count,
                     "updated_at": conv.updated_at.isoformat(),
                     "created_at": conv.created_at.isoformat()
                 }
@@ -716,6 +786,9 @@ class DatabaseConversationService:
         """
         Helper method to get a conversation by user or channel ID.
         
+        Known conversations are fetched by primary key from the PK cache; otherwise a
+        single join query resolves the Discord ID and the result is cached.
+        
         Args:
             session: Database session
             discord_user_id: Discord user ID (optional)
@@ -725,17 +798,194 @@ class DatabaseConversationService:
             Conversation object or None if not found
         """
         if discord_user_id:
-            user = session.query(User).filter_by(discord_id=discord_user_id).first()
-            if not user:
-                return None
-                
-            return session.query(Conversation).filter_by(user_id=user.id).first()
-            
+            key = ("user", discord_user_id)
         elif discord_channel_id:
-            channel = session.query(Channel).filter_by(discord_id=discord_channel_id).first()
-            if not channel:
-                return None
-                
-            return session.query(Conversation).filter_by(channel_id=channel.id).first()
-            
-        return None
\ No newline at end of file
+            key = ("channel", discord_channel_id)
+        else:
+            return None
+        
+        pk = self._conversation_pks.get(key)
+        if pk is not None:
+            conversation = session.get(Conversation, pk)
+            if conversation is not None:
+                self._conversation_pks.move_to_end(key)
+                return conversation
+            # Deleted behind our back; resolve it again
+            del self._conversation_pks[key]
+            self._history.pop(pk, None)
+            self._untrimmed.pop(pk, None)
+        
+        # Lambda statements, only built on a cache miss: compiled once, later calls
+        # only bind the Discord ID
+        if discord_user_id:
+            stmt = lambda_stmt(lambda: select(Conversation)
+                               .join(User, Conversation.user_id == User.id)
+                               .where(User.discord_id == discord_user_id)
+                               .limit(1))
+        else:
+            stmt = lambda_stmt(lambda: select(Conversation)
+                               .join(Channel, Conversation.channel_id == Channel.id)
+                               .where(Channel.discord_id == discord_channel_id)
+                               .limit(1))
+        conversation = session.scalars(stmt).first()
+        if conversation is not None:
+            self._remember_conversation(key, conversation.id)
+        return conversation
+    
+    def _clear_messages(self, session, key: Tuple[str, int], conversation_ids) -> bool:
+        """
+        Delete every message of a conversation with a single DELETE.
+        
+        Uses the cached conversation primary key when there is one, else
+        ``conversation_ids`` (a SELECT of the owner's conversation ids) as a subquery.
+        """
+        pk = self._conversation_pks.get(key)
+        if pk is not None:
+            condition = Message.conversation_id == pk
+        else:
+            condition = Message.conversation_id.in_(conversation_ids)
+        result = session.execute(delete(Message).where(condition),
+                                 execution_options={"synchronize_session": False})
+        
+        # Only conversations with a cached primary key can have cached history
+        # (or a trim count; a missing count trims on the next write)
+        if pk is not None:
+            self._forget_history(session, pk)
+            self._untrimmed.pop(pk, None)
+        return result.rowcount > 0
+    
+    def _formatted_history(self, session, conversation_id: int, max_history: int) -> List[Dict[str, Any]]:
+        """
+        Get the last ``max_history`` messages of a conversation, formatted for the Gemini API.
+        
+        Served from the in-memory history cache; on a miss the newest
+        MAX_STORED_MESSAGES are loaded once and cached.
+        """
+        if max_history > MAX_STORED_MESSAGES:
+            # Longer than the cache holds; read it from the database
+            return [{"role": role, "parts": [{"text": content}]}
+                    for role, content in load_turns(session, conversation_id, limit=max_history)]
+        
+        history = self._history.get(conversation_id)
+        if history is None:
+            rows = load_turns(session, conversation_id, limit=MAX_STORED_MESSAGES)
+            history = deque(({"role": role, "parts": [{"text": content}]} for role, content in rows),
+                            maxlen=MAX_STORED_MESSAGES)
+            self._history[conversation_id] = history
+            if len(self._history) > HISTORY_CACHE_SIZE:
+                self._history.popitem(last=False)
+        self._history.move_to_end(conversation_id)
+        
+        skip = max(len(history) - max_history, 0)
+        return list(itertools.islice(history, skip, None))
+    
+    def _insert_messages(self, session, rows: List[Dict[str, Any]]) -> None:
+        """
+        Insert message rows of one conversation, append them to its cached history
+        and trim the stored history when it is due.
+        """
+        bulk_add_messages(session, rows)
+        
+        conversation_id = rows[0]["conversation_id"]
+        self._maybe_trim(session, conversation_id, len(rows))
+        history = self._history.get(conversation_id)
+        if history is not None:
+            history.extend({"role": row["role"], "parts": [{"text": row["content"]}]} for row in rows)
+            self._forget_history_on_rollback(session, conversation_id)
+    
+    def _forget_history(self, session, conversation_id: int) -> None:
+        """Mark a conversation's cached history as empty after its messages were deleted."""
+        if conversation_id in self._history:
+            self._history[conversation_id] = deque(maxlen=MAX_STORED_MESSAGES)
+            self._forget_history_on_rollback(session, conversation_id)
+    
+    def _forget_history_on_rollback(self, session, conversation_id: int) -> None:
+        session.info.setdefault("on_rollback", []).append(lambda: self._history.pop(conversation_id, None))
+    
+    def _user_id(self, session, discord_user_id: int, username: str) -> int:
+        """
+        Get the primary key of a user, creating or renaming the user if needed.
+        
+        Known users whose username hasn't changed are answered from memory without
+        touching the database; anyone else goes through upsert_user().
+        """
+        cached = self._user_pks.get(discord_user_id)
+        if cached is not None and (not username or username == cached[1]):
+            self._user_pks.move_to_end(discord_user_id)
+            return cached[0]
+        
+        user = upsert_user(session, discord_user_id, username)
+        self._remember_user(user)
+        session.info.setdefault("on_rollback", []).append(lambda: self._user_pks.pop(discord_user_id, None))
+        return user.id
+    
+    def _find_user(self, session, discord_user_id: int) -> Optional[User]:
+        """
+        Get an existing user by Discord ID.
+        
+        Known users are fetched with session.get(), which answers from the session's
+        identity map without any SQL when the user is already loaded in this scope.
+        """
+        cached = self._user_pks.get(discord_user_id)
+        if cached is not None:
+            user = session.get(User, cached[0])
+            if user is not None:
+                self._user_pks.move_to_end(discord_user_id)
+                return user
+            del self._user_pks[discord_user_id]
+            self._personalities.pop(discord_user_id, None)
+        
+        user = session.query(User).filter_by(discord_id=discord_user_id).first()
+        if user is not None:
+            self._remember_user(user)
+        return user
+    
+    def _remember_user(self, user: User) -> None:
+        """Cache a Discord user ID -> (user primary key, username) mapping."""
+        self._user_pks[user.discord_id] = (user.id, user.username)
+        self._user_pks.move_to_end(user.discord_id)
+        if len(self._user_pks) > USER_PK_CACHE_SIZE:
+            evicted, _ = self._user_pks.popitem(last=False)
+            self._personalities.pop(evicted, None)
+    
+    def _remember_personality(self, session, discord_user_id: int, personality: Optional[str]) -> None:
+        """Cache a known user's personality, forgetting it again if the transaction rolls back."""
+        if discord_user_id in self._user_pks:
+            self._personalities[discord_user_id] = personality
+            session.info.setdefault("on_rollback", []).append(lambda: self._personalities.pop(discord_user_id, None))
+    
+    def _user_conversation(self, session, user_id: int, discord_user_id: int) -> Conversation:
+        """Get a user's conversation, creating it if needed."""
+        conversation = self._get_conversation(session, discord_user_id=discord_user_id)
+        if not conversation:
+            conversation = Conversation(user_id=user_id, mood="thoughtful", energy_level=3)
+            session.add(conversation)
+            session.flush()
+            self._remember_conversation(("user", discord_user_id), conversation.id)
+        return conversation
+    
+    def _channel_conversation(self, session, discord_channel_id: int, channel_name: Optional[str] = None) -> Conversation:
+        """
+        Get a channel's conversation, creating the channel and conversation if needed.
+        
+        An existing conversation is found with one join on the channel's Discord ID
+        (or by primary key when cached), so the Channel row itself is never loaded.
+        """
+        conversation = self._get_conversation(session, discord_channel_id=discord_channel_id)
+        if not conversation:
+            channel = self.get_or_create_channel(discord_channel_id, channel_name)
+            conversation = Conversation(channel_id=channel.id, mood="thoughtful", energy_level=3)
+            session.add(conversation)
+            session.flush()
+            self._remember_conversation(("channel", discord_channel_id), conversation.id)
+        return conversation
+    
+    def _remember_conversation(self, key: Tuple[str, int], conversation_id: int) -> None:
+        """Cache a ("user" | "channel", Discord ID) -> conversation primary key mapping."""
+        self._conversation_pks[key] = conversation_id
+        self._conversation_pks.move_to_end(key)
+        if len(self._conversation_pks) > CONVERSATION_PK_CACHE_SIZE:
+            # History is only cached for conversations whose primary key is cached
+            _, evicted = self._conversation_pks.popitem(last=False)
+            self._history.pop(evicted, None)
+            self._untrimmed.pop(evicted, None)
@@ -196,6 +196,54 @@ class DBConversationAdapter:
             logger.error(f"Error adding channel assistant message to database: {e}")
             return False
     
+    def add_exchange(self, user_id: int, user_content: str, assistant_content: str, author_name: str = "") -> bool:
+        """
+        Add a user message and the assistant's reply to a user's conversation history.
+        
+        Args:
+            user_id: Discord user ID
+            user_content: The user's message
+            assistant_content: The assistant's reply
+            author_name: Name of the user
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        if not USE_DATABASE:
+            return True
+        
+        try:
+            self.db_service.add_exchange(user_id, user_content, assistant_content, author_name)
+            return True
+        except Exception as e:
+            logger.error(f"Error adding exchange to database: {e}")
+            return False
+    
+    def add_channel_exchange(self, channel_id: int, user_id: int, user_content: str,
+                             assistant_content: str, author_name: str = "") -> bool:
+        """
+        Add a user message and the assistant's reply to a channel's conversation history.
+        
+        Args:
+            channel_id: Discord channel ID
+            user_id: Discord user ID
+            user_content: The user's message
+            assistant_content: The assistant's reply
+            author_name: Name of the user
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        if not USE_DATABASE:
+            return True
+        
+        try:
+            self.db_service.add_channel_exchange(channel_id, user_id, user_content, assistant_content, author_name)
+            return True
+        except Exception as e:
+            logger.error(f"Error adding channel exchange to database: {e}")
+            return False
+    
     def clear_user_conversation(self, user_id: int) -> bool:
         """
         Clear a user's conversation history.
@@ -0,0 +1,16 @@
+"""
+Shared setup for the Google Generative AI client.
+"""
+import functools
+
+import google.generativeai as genai
+
+
+@functools.lru_cache(maxsize=None)
+def configure_genai(api_key: str) -> None:
+    """Configure the Gemini client once per API key, process-wide.
+
+    genai.configure() drops the SDK's cached clients, so calling it again
+    would throw away their open connections.
+    """
+    genai.configure(api_key=api_key)
@@ -0,0 +1,105 @@
+"""
+Semantic response cache.
+Reuses an earlier answer when a new prompt's embedding is close enough to one already answered.
+"""
+import math
+import time
+import asyncio
+import operator
+import threading
+from collections import OrderedDict
+
+import google.generativeai as genai
+
+# Concurrent prompts are embedded together: up to this many per request, gathered over this window
+EMBEDDING_BATCH_SIZE = 32
+EMBEDDING_BATCH_WINDOW = 0.05  # seconds
+
+
+class SemanticCache:
+    """LRU/TTL cache of answers looked up by cosine similarity of prompt embeddings."""
+    
+    def __init__(self, threshold: float = 0.92, maxsize: int = 1024, ttl_seconds: float = 3600):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        # sha256(prompt) -> (unit-length embedding, response text, monotonic timestamp)
+        self._entries: "OrderedDict[str, tuple[list[float], str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _normalize(embedding) -> list[float]:
+        norm = math.sqrt(sum(v * v for v in embedding)) or 1.0
+        return [v / norm for v in embedding]
+    
+    def lookup(self, embedding) -> str | None:
+        """Return the cached answer closest to ``embedding`` if it clears the threshold."""
+        query = self._normalize(embedding)
+        now = time.monotonic()
+        best_key, best_score = None, self.threshold
+        with self._lock:
+            for key, (vector, _, stored_at) in list(self._entries.items()):
+                if now - stored_at > self.ttl_seconds:
+                    del self._entries[key]
+                    continue
+                score = sum(map(operator.mul, vector, query))
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is None:
+                return None
+            self._entries.move_to_end(best_key)
+            return self._entries[best_key][1]
+    
+    def store(self, key: str, embedding, text: str) -> None:
+        """Remember ``text`` as the answer for the prompt with this embedding."""
+        with self._lock:
+            self._entries[key] = (self._normalize(embedding), text, time.monotonic())
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+class EmbeddingBatcher:
+    """Coalesce concurrent embedding requests into batched Gemini API calls."""
+    
+    def __init__(self, model: str, max_batch: int = EMBEDDING_BATCH_SIZE, window: float = EMBEDDING_BATCH_WINDOW):
+        self.model = model
+        self.max_batch = max_batch
+        self.window = window
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+    
+    async def embed(self, text: str) -> list[float]:
+        """Return the embedding for ``text``, sharing an API call with concurrent callers."""
+        if self._worker is None or self._worker.done():
+            # (Re)start the worker on the current loop
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((text, future))
+        return await future
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                result = await genai.embed_content_async(model=self.model, content=[text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), embedding in zip(batch, result["embedding"]):
+                if not future.done():
+                    future.set_result(embedding)
@@ -6,7 +6,6 @@ This script is designed to be run by the workflow system.
 import os
 import sys
 import logging
-from types import ModuleType
 
 # Configure logging first
 logging.basicConfig(
@@ -16,33 +15,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Create mock modules to prevent imports
-class MockFlaskModule(ModuleType):
-    def __init__(self, name):
-        super().__init__(name)
-        
-    def __getattr__(self, name):
-        return self._mock_attr
-        
-    def _mock_attr(self, *args, **kwargs):
-        return None
-
-# Install mocks before any other imports
-sys.modules['flask'] = MockFlaskModule('flask')
-sys.modules['flask_sqlalchemy'] = MockFlaskModule('flask_sqlalchemy')
-
-# Now we can safely import the Discord modules
+# Import the Discord modules
 try:
     import discord
     from discord.ext import commands
-    from dotenv import load_dotenv
+    from config import load_env_once
     import google.generativeai as genai
 except ImportError as e:
     logger.critical(f"Failed to import required libraries: {e}")
     sys.exit(1)
 
 # Load environment variables
-load_dotenv()
+load_env_once()
 
 # Bot configuration
 PREFIX = "!"